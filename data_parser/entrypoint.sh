@@ -7,7 +7,7 @@ done
 echo "PostgreSQL started"
 
 echo "Starting data migration"
-python3 parser/load_data.py
+python3 parser/load_data.py || { echo "Data migration failed"; exit 1; }
 echo "Finished data migration"
 
 exec "$@"
\ No newline at end of file
@@ -8,6 +8,12 @@ import psycopg2
 from psycopg2.extras import DictCursor
 
 
+class DataImportError(Exception):
+    """
+    Raised when the data of some table can't be imported to Postgres
+    """
+
+
 @contextmanager
 def sqlite_conn_context(db_path: str, logger: logging.Logger):
     db_path = Path(db_path)
@@ -1,12 +1,12 @@
 import csv
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Iterator
 
 import sqlite3
 from sqlite3 import Connection as sqlite_connection
 
-from settings import EXPORT_FILES_DIR, CHUNK_SIZE
+from settings import EXPORT_FILES_DIR, CHUNK_SIZE, BATCH_SIZE
 
 
 class SQLiteExtractor:
@@ -22,13 +22,32 @@ class SQLiteExtractor:
         self._table_fields_mapper: dict[str, tuple[str, ...]] = fields_mapper
         self._fields: Optional[tuple] = None
 
-    def _compile_export_query(self, db_table: str) -> Optional[str]:
+    def _compile_export_query(self, db_table: str, rowid_range: Optional[tuple[int, int]] = None) -> Optional[str]:
         """
         Generate SQL query string for data extraction
         """
 
-        query = f"SELECT {('{}, ' * len(self._fields))[:-2]} FROM {db_table};"
-        return query.format(*self._fields)
+        query = f"SELECT {('{}, ' * len(self._fields))[:-2]} FROM {db_table}"
+        if rowid_range:
+            query += f" WHERE rowid BETWEEN {rowid_range[0]} AND {rowid_range[1]}"
+        return f"{query};".format(*self._fields)
+
+    def get_rowid_ranges(self, db_table: str, parts: int) -> list[tuple[int, int]]:
+        """
+        Splits table rows into the provided number of rowid ranges
+        """
+
+        try:
+            min_rowid, max_rowid = self._db_connection.execute(
+                f"SELECT MIN(rowid), MAX(rowid) FROM {db_table};"
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._logger.error(f"Error while trying to load data from initial database: {e}")
+            return []
+        if min_rowid is None:
+            return []
+        step = (max_rowid - min_rowid) // parts + 1
+        return [(start, min(start + step - 1, max_rowid)) for start in range(min_rowid, max_rowid + 1, step)]
 
     @staticmethod
     def _create_files_dir():
@@ -66,3 +85,22 @@ class SQLiteExtractor:
                         while table_content := curs.fetchmany(CHUNK_SIZE):
                             for row in table_content:
                                 writer.writerow(dict(row))
+
+    def stream_table_data(self, db_table: str, rowid_range: Optional[tuple[int, int]] = None) -> Iterator[list[dict]]:
+        """
+        Yields table data (or its part within rowid range) by batches
+        """
+
+        self._fields = self._table_fields_mapper.get(db_table)
+        if not self._fields:
+            self._logger.error(f"Error while trying to compile export query for table {db_table}")
+            return
+        export_query = self._compile_export_query(db_table, rowid_range)
+        curs = self._db_connection.cursor()
+        try:
+            curs.execute(export_query)
+        except sqlite3.Error as e:
+            self._logger.error(f"Error while trying to load data from initial database: {e}")
+            return
+        while table_content := curs.fetchmany(BATCH_SIZE):
+            yield [dict(row) for row in table_content]
@@ -1,5 +1,6 @@
 import logging
 import os
+import sys
 
 from psycopg2.extensions import connection as pg_connection
 from psycopg2 import OperationalError
@@ -7,8 +8,9 @@ from sqlite3 import Connection as sqlite_connection
 
 from extractor import SQLiteExtractor
 from saver import PostgresSaver
-from common import sqlite_conn_context, pg_conn_context
-from settings import TABLES_TO_EXPORT, EXPORT_TABLE_FIELDS_MAPPER, SQLITE_FILE, POSTGRES_DSN
+from common import sqlite_conn_context, pg_conn_context, DataImportError
+from settings import (TABLES_TO_EXPORT, EXPORT_TABLE_FIELDS_MAPPER, SQLITE_FILE, POSTGRES_DSN, MIGRATION_MODE,
+                      PARALLEL_WORKERS)
 
 
 def load_from_sqlite(sqlite_conn: sqlite_connection, pg_conn: pg_connection, logger):
@@ -19,8 +21,13 @@ def load_from_sqlite(sqlite_conn: sqlite_connection, pg_conn: pg_connection, log
     sqlite_extractor = SQLiteExtractor(sqlite_conn, TABLES_TO_EXPORT, EXPORT_TABLE_FIELDS_MAPPER, logger)
     postgres_saver = PostgresSaver(pg_conn, TABLES_TO_EXPORT, logger)
 
-    sqlite_extractor.extract_movies()
-    postgres_saver.save_all_data()
+    if MIGRATION_MODE == "stream" and PARALLEL_WORKERS > 1:
+        postgres_saver.stream_all_data_parallel(sqlite_extractor, PARALLEL_WORKERS)
+    elif MIGRATION_MODE == "stream":
+        postgres_saver.stream_all_data(sqlite_extractor)
+    else:
+        sqlite_extractor.extract_movies()
+        postgres_saver.save_all_data()
     os.environ["PARSING_STATUS"] = "OK"
 
 
@@ -38,3 +45,6 @@ if __name__ == "__main__":
     except OperationalError:
         app_logger.debug(POSTGRES_DSN)
         app_logger.critical("Can not connect to Postgres with provided credentials")
+    except DataImportError as e:
+        app_logger.critical(f"Data import is stopped: {e}")
+        sys.exit(1)
@@ -1,6 +1,8 @@
 import logging
 import sys
-from typing import Optional, Type, Any
+import dataclasses
+from operator import itemgetter
+from typing import Optional, Type, Any, Callable
 
 from settings import EXPORT_TABLE_DATACLASS_MAPPER, IMPORT_TABLE_FIELDS_MAPPER
 import serializers
@@ -15,9 +17,15 @@ class DataParser:
         self._table_name: str = table_name
         self._logger: logging.Logger = logger
         self._dataclass: Optional[Type[Any]] = None
-        self._data_objects_list: Optional[list[Type[Any], ...]] = None
+        self._fields: Optional[tuple[dataclasses.Field, ...]] = None
+        self._row_mapper: Optional[Callable[[dict], tuple]] = None
 
         self._get_target_dataclass()
+        self._compile_row_mapper()
+
+    @property
+    def fields(self) -> Optional[tuple[dataclasses.Field, ...]]:
+        return self._fields
 
     def _get_target_dataclass(self) -> None:
         """
@@ -38,15 +46,38 @@ class DataParser:
                                f"data class was found")
             self._dataclass = None
 
-    def parse_data(self, income_data: list[dict, ...], ) -> Optional[list]:
+    def _compile_row_mapper(self) -> None:
+        """
+        Compiles the converter of income data row into tuple of values ordered as the data class fields
+        """
+
+        if not self._dataclass:
+            return
+
+        self._fields = dataclasses.fields(self._dataclass)
+        income_keys = {value: key for key, value in IMPORT_TABLE_FIELDS_MAPPER.get(self._table_name).items()}
+        row_getter = itemgetter(*(income_keys[field.name] for field in self._fields))
+
+        empty_values_defaults = getattr(self._dataclass, "EMPTY_VALUES_DEFAULTS", {})
+        positional_defaults = [(index, empty_values_defaults[field.name]) for index, field in enumerate(self._fields)
+                               if field.name in empty_values_defaults]
+        if not positional_defaults:
+            self._row_mapper = row_getter
+            return
+
+        def row_mapper(data_item: dict) -> tuple:
+            values = list(row_getter(data_item))
+            for index, default in positional_defaults:
+                if values[index] is None or values[index] == "":
+                    values[index] = default
+            return tuple(values)
+
+        self._row_mapper = row_mapper
+
+    def parse_rows(self, income_data: list[dict, ...]) -> Optional[list[tuple]]:
         """
-        Perform data parsing
+        Perform data parsing into tuples of values ordered as the data class fields
         """
 
-        if self._dataclass:
-            self._data_objects_list = []
-            for data_item in income_data:
-                mapped_item = dict({value: data_item[key]
-                                    for key, value in IMPORT_TABLE_FIELDS_MAPPER.get(self._table_name).items()})
-                self._data_objects_list.append(self._dataclass(**mapped_item))
-            return self._data_objects_list
+        if self._row_mapper:
+            return list(map(self._row_mapper, income_data))
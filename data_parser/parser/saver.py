@@ -1,16 +1,22 @@
+import io
 import csv
 import logging
+from itertools import islice
 from pathlib import Path
-from typing import Optional
-from dataclasses import astuple
+from typing import Optional, Literal, Iterator, get_origin
 import dataclasses
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 
 import psycopg2
 from psycopg2.extensions import connection as pg_connection, cursor
 
-from settings import EXPORT_FILES_DIR, POSTGRES_SCHEMA, EXPORT_TABLE_FIELDS_MAPPER, CHUNK_SIZE
+from settings import (EXPORT_FILES_DIR, POSTGRES_SCHEMA, EXPORT_TABLE_FIELDS_MAPPER, CHUNK_SIZE, IMPORT_MODE,
+                      BATCH_SIZE, TABLES_TO_EXPORT, SQLITE_FILE, POSTGRES_DSN, PARALLEL_LOAD_STAGES,
+                      PARALLEL_SPLIT_TABLES)
 from parser import DataParser
+from extractor import SQLiteExtractor
+from common import sqlite_conn_context, pg_conn_context, DataImportError
 
 
 class PostgresSaver:
@@ -77,57 +83,197 @@ class PostgresSaver:
         return True
 
     @staticmethod
-    def _prepare_pg_query(serialized_data: list, pg_cursor: cursor, table: str) -> str:
+    def _prepare_pg_query(serialized_data: list[tuple],
+                          data_fields: tuple[dataclasses.Field, ...],
+                          pg_cursor: cursor,
+                          table: str) -> str:
         """
         Prepare SQL query for data import
         """
 
-        column_names = [field.name for field in dataclasses.fields(serialized_data[0])]
+        column_names = [field.name for field in data_fields]
         column_names_str = ",".join(column_names)
         col_count = ", ".join(["%s"] * len(column_names))
-        bind_values = ",".join(pg_cursor.mogrify(f"({col_count})", astuple(item)).decode("utf-8")
+        bind_values = ",".join(pg_cursor.mogrify(f"({col_count})", item).decode("utf-8")
                                for item in serialized_data)
         query = (f"INSERT INTO {POSTGRES_SCHEMA}.{table} ({column_names_str}) VALUES {bind_values} "
                  f"ON CONFLICT (id) DO NOTHING")
         return query
 
+    @staticmethod
+    def _prepare_pg_copy_queries(data_fields: tuple[dataclasses.Field, ...], table: str) -> tuple[str, str]:
+        """
+        Prepare SQL queries for data import via staging table: COPY to staging table and INSERT from it
+        """
+
+        column_names_str = ",".join(field.name for field in data_fields)
+        # Empty values of text columns are imported as empty strings, empty values of other columns as NULL
+        text_column_names_str = ",".join(field.name for field in data_fields
+                                         if field.type is str or get_origin(field.type) is Literal)
+        force_not_null = f", FORCE_NOT_NULL ({text_column_names_str})" if text_column_names_str else ""
+        copy_query = f"COPY {table}_staging ({column_names_str}) FROM STDIN WITH (FORMAT csv{force_not_null})"
+        insert_query = (f"INSERT INTO {POSTGRES_SCHEMA}.{table} ({column_names_str}) "
+                        f"SELECT {column_names_str} FROM {table}_staging "
+                        f"ON CONFLICT DO NOTHING")
+        return copy_query, insert_query
+
+    def _copy_table_data(self, table: str, data_batches: Iterator[list[dict]]) -> None:
+        """
+        Perform data import of one table via COPY to staging table (in one transaction)
+        """
+
+        serializer = DataParser(table, self._logger)
+        total_read = 0
+        total_write = 0
+
+        if not serializer.fields:
+            return
+        copy_query, insert_query = self._prepare_pg_copy_queries(serializer.fields, table)
+
+        with self._db_connection as conn:
+            curs = conn.cursor()
+            try:
+                curs.execute(f"CREATE TEMP TABLE {table}_staging (LIKE {POSTGRES_SCHEMA}.{table}) ON COMMIT DROP;")
+                for extracted in data_batches:
+                    total_read += len(extracted)
+                    buffer = io.StringIO()
+                    csv.writer(buffer, lineterminator="\n").writerows(serializer.parse_rows(extracted))
+                    buffer.seek(0)
+                    curs.copy_expert(copy_query, buffer)
+                curs.execute(insert_query)
+                total_write = curs.rowcount
+            except psycopg2.Error as e:
+                conn.rollback()
+                self._logger.error(f"An error while trying to import data to Postgres: {e}")
+                raise DataImportError(f"Can't import table {table}: {e}") from e
+        self._logger.debug(f"Table {table} | "
+                           f"Exported items cnt: {total_read} | "
+                           f"Imported items cnt: {total_write}")
+
+    def _insert_table_data(self, table: str, data_batches: Iterator[list[dict]]) -> None:
+        """
+        Perform data import of one table via multi-row INSERT queries (transaction per chunk)
+        """
+
+        serializer = DataParser(table, self._logger)
+        total_read = 0
+        total_write = 0
+
+        if not serializer.fields:
+            return
+
+        for items_list in data_batches:
+            total_read += len(items_list)
+            for start in range(0, len(items_list), CHUNK_SIZE):
+                with self._db_connection as conn:
+                    curs = conn.cursor()
+                    serialized = serializer.parse_rows(items_list[start:start + CHUNK_SIZE])
+
+                    query = self._prepare_pg_query(serialized, serializer.fields, curs, table)
+
+                    try:
+                        curs.execute(query)
+                        conn.commit()
+                        total_write += len(serialized)
+                    except psycopg2.Error as e:
+                        conn.rollback()
+                        self._logger.error(f"An error while trying to import data to Postgres: {e}")
+                        raise DataImportError(f"Can't import table {table}: {e}") from e
+        self._logger.debug(f"Table {table} | "
+                           f"Exported items cnt: {total_read} | "
+                           f"Imported items cnt: {total_write}")
+
+    def _save_table_data(self, table: str, data_batches: Iterator[list[dict]]) -> None:
+        """
+        Perform data import of one table according to import mode
+        """
+
+        if IMPORT_MODE == "copy":
+            self._copy_table_data(table, data_batches)
+        else:
+            self._insert_table_data(table, data_batches)
+
+    @staticmethod
+    def _read_csv_file(table: str) -> Iterator[list[dict]]:
+        """
+        Yields exported csv file data by batches
+        """
+
+        with open(f"{EXPORT_FILES_DIR}/{table}.csv") as csvfile:
+            reader = csv.DictReader(csvfile, fieldnames=EXPORT_TABLE_FIELDS_MAPPER.get(table))
+            while items_list := list(islice(reader, BATCH_SIZE)):
+                yield items_list
+
     def save_all_data(self):
         """
-        Perform data import
+        Perform data import from exported csv files
         """
 
         if not all([self._check_files(), self._check_tables()]):
             return
 
         for table in self._tables_to_export:
-            serializer = DataParser(table, self._logger)
-            fields = EXPORT_TABLE_FIELDS_MAPPER.get(table)
-
-            with open(f"{EXPORT_FILES_DIR}/{table}.csv") as csvfile:
-                items_list = list(csv.DictReader(csvfile, fieldnames=fields))
-                start = 0
-                step = CHUNK_SIZE
-                total_read = 0
-                total_write = 0
-                while items_list:
-                    with self._db_connection as conn:
-                        curs = conn.cursor()
-                        _slice = slice(start, step)
-                        extracted = items_list[_slice]
-                        buff = [dict(row) for row in extracted]
-                        total_read += len(buff)
-                        del items_list[_slice]
-                        serialized = serializer.parse_data(buff)
-
-                        query = self._prepare_pg_query(serialized, curs, table)
-
-                        try:
-                            curs.execute(query)
-                            conn.commit()
-                            total_write += len(serialized)
-                        except psycopg2.Error as e:
-                            self._logger.error(f"An error while trying to import data to Postgres: {e}")
-                self._logger.debug(f"Table {table} | "
-                                   f"Exported items cnt: {total_read} | "
-                                   f"Imported items cnt: {total_write}")
+            self._save_table_data(table, self._read_csv_file(table))
         shutil.rmtree(EXPORT_FILES_DIR)
+
+    def stream_all_data(self, extractor: SQLiteExtractor):
+        """
+        Perform data import directly from SQLite database
+        """
+
+        if not self._check_tables():
+            return
+
+        for table in self._tables_to_export:
+            self.stream_table_data(extractor, table)
+
+    def stream_table_data(self,
+                          extractor: SQLiteExtractor,
+                          table: str,
+                          rowid_range: Optional[tuple[int, int]] = None):
+        """
+        Perform data import of one table (or its part within rowid range) directly from SQLite database
+        """
+
+        self._save_table_data(table, extractor.stream_table_data(table, rowid_range))
+
+    def stream_all_data_parallel(self, extractor: SQLiteExtractor, workers: int):
+        """
+        Perform data import directly from SQLite database by parallel processes stage by stage
+
+        The first failed part of the stage cancels the parts not started yet and stops the import before the next stage.
+        """
+
+        if not self._check_tables():
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for stage in PARALLEL_LOAD_STAGES:
+                futures = []
+                for table in stage:
+                    if table not in self._tables_to_export:
+                        continue
+                    if table in PARALLEL_SPLIT_TABLES:
+                        for rowid_range in extractor.get_rowid_ranges(table, workers):
+                            futures.append(executor.submit(_stream_table_part, table, rowid_range))
+                    else:
+                        futures.append(executor.submit(_stream_table_part, table))
+                # Waiting for the whole stage to be committed before loading the dependent tables
+                try:
+                    for future in futures:
+                        future.result()
+                except Exception:
+                    executor.shutdown(cancel_futures=True)
+                    raise
+
+
+def _stream_table_part(table: str, rowid_range: Optional[tuple[int, int]] = None):
+    """
+    Perform data import of one table (or its part) in separate process with its own connections
+    """
+
+    logger = logging.getLogger()
+    with (sqlite_conn_context(SQLITE_FILE, logger) as sqlite_context,
+          pg_conn_context(POSTGRES_DSN) as pg_context):
+        extractor = SQLiteExtractor(sqlite_context, TABLES_TO_EXPORT, EXPORT_TABLE_FIELDS_MAPPER, logger)
+        PostgresSaver(pg_context, TABLES_TO_EXPORT, logger).stream_table_data(extractor, table, rowid_range)
@@ -1,10 +1,10 @@
 import uuid
 import datetime
 from dataclasses import dataclass, field
-from typing import Literal
+from typing import Literal, ClassVar
 
 
-@dataclass
+@dataclass(slots=True)
 class Genre:
     name: str
     description: str
@@ -13,7 +13,7 @@ class Genre:
     id: uuid.UUID = field(default_factory=uuid.uuid4)
 
 
-@dataclass
+@dataclass(slots=True)
 class Person:
     full_name: str
     created: datetime.datetime
@@ -21,7 +21,7 @@ class Person:
     id: uuid.UUID = field(default_factory=uuid.uuid4)
 
 
-@dataclass
+@dataclass(slots=True)
 class FilmWork:
     title: str
     description: str
@@ -32,14 +32,16 @@ class FilmWork:
     rating: float = field(default=0.0)
     id: uuid.UUID = field(default_factory=uuid.uuid4)
 
+    # defaults for the fields imported with empty values
+    EMPTY_VALUES_DEFAULTS: ClassVar[dict] = {"creation_date": datetime.date(2000, 1, 1), "rating": 0.0}
+
     def __post_init__(self):
-        if self.creation_date is None or self.creation_date == "":
-            self.creation_date = datetime.date(2000, 1, 1)
-        if self.rating is None or self.rating == "":
-            self.rating = 0.0
+        for field_name, default in self.EMPTY_VALUES_DEFAULTS.items():
+            if getattr(self, field_name) is None or getattr(self, field_name) == "":
+                setattr(self, field_name, default)
 
 
-@dataclass
+@dataclass(slots=True)
 class GenreFilmWork:
     genre_id: uuid.UUID
     film_work_id: uuid.UUID
@@ -47,7 +49,7 @@ class GenreFilmWork:
     id: uuid.UUID = field(default_factory=uuid.uuid4)
 
 
-@dataclass
+@dataclass(slots=True)
 class PersonFilmWork:
     person_id: uuid.UUID
     film_work_id: uuid.UUID
@@ -26,6 +26,22 @@ IMPORT_TABLE_FIELDS_MAPPER = {
 
 CHUNK_SIZE = 20
 
+# "copy" - COPY to staging table and INSERT from it (transaction per table), "insert" - multi-row INSERT by chunks
+IMPORT_MODE = os.environ.get("IMPORT_MODE", "copy")
+
+# "stream" - rows are piped from SQLite to Postgres by batches, "csv" - tables are exported to csv files first
+MIGRATION_MODE = os.environ.get("MIGRATION_MODE", "stream")
+
+# rows count in batches read from SQLite or csv files
+BATCH_SIZE = 10000
+
+# parallel streaming (if more than one worker): tables of one stage are loaded simultaneously by separate processes
+# with its own connections and the next stage is started after the previous one is committed, split tables are
+# divided between all the workers by rowid ranges
+PARALLEL_WORKERS = int(os.environ.get("PARALLEL_WORKERS", os.cpu_count() or 1))
+PARALLEL_LOAD_STAGES = (("genre", "person", "film_work"), ("genre_film_work", "person_film_work"))
+PARALLEL_SPLIT_TABLES = ("genre_film_work", "person_film_work")
+
 POSTGRES_DSN = {
     "dbname": os.environ.get("POSTGRES_DBNAME", "postgres"),
     "user": os.environ.get("POSTGRES_USER", "postgres"),
@@ -0,0 +1,30 @@
+import sys
+import dataclasses
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "parser"))
+
+from saver import PostgresSaver  # noqa: E402
+from serializers import GenreFilmWork, Person  # noqa: E402
+
+
+class PrepareCopyQueriesTestCase(unittest.TestCase):
+    def test_table_without_text_columns(self):
+        copy_query, insert_query = PostgresSaver._prepare_pg_copy_queries(dataclasses.fields(GenreFilmWork),
+                                                                          "genre_film_work")
+
+        self.assertEqual(copy_query, "COPY genre_film_work_staging (genre_id,film_work_id,created,id) FROM STDIN "
+                                     "WITH (FORMAT csv)")
+        self.assertNotIn("FORCE_NOT_NULL", copy_query)
+        self.assertIn("INSERT INTO content.genre_film_work (genre_id,film_work_id,created,id)", insert_query)
+
+    def test_table_with_text_columns(self):
+        copy_query, _ = PostgresSaver._prepare_pg_copy_queries(dataclasses.fields(Person), "person")
+
+        self.assertEqual(copy_query, "COPY person_staging (full_name,created,modified,id) FROM STDIN "
+                                     "WITH (FORMAT csv, FORCE_NOT_NULL (full_name))")
+
+
+if __name__ == "__main__":
+    unittest.main()
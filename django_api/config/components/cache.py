@@ -0,0 +1,19 @@
+import os
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://{}:{}/{}'.format(
+            os.environ.get('REDIS_HOST', '127.0.0.1'),
+            os.environ.get('REDIS_PORT', 6379),
+            os.environ.get('REDIS_CACHE_DB', 1),
+        ),
+    }
+}
+
+# API RESPONSES CACHING
+API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT', 300))
+
+# API PAGINATION TOTAL COUNT CACHING (the estimate from Postgres statistics is used above the threshold, 0 disables it)
+API_COUNT_CACHE_TIMEOUT = int(os.environ.get('API_COUNT_CACHE_TIMEOUT', 60))
+API_COUNT_ESTIMATE_THRESHOLD = int(os.environ.get('API_COUNT_ESTIMATE_THRESHOLD', 0))
@@ -19,6 +19,13 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'movies.api.v1.pagination.NumberPaginationNoLinks',
     'PAGE_SIZE': 50
 }
+# Movies API fast path: rows fetched with .values() are serialized without DRF fields and rendered with orjson
+API_FAST_SERIALIZATION = os.environ.get('API_FAST_SERIALIZATION', False) == 'True'
+if API_FAST_SERIALIZATION:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'movies.api.v1.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
 APPEND_SLASH = True
 
 # I18N & CUSTOMISATION
@@ -0,0 +1,12 @@
+import os
+
+# ELASTICSEARCH (movies search, the index is filled by the ETL service)
+ELASTIC_HOSTS = ['{}://{}:{}'.format(
+    os.environ.get('ELASTIC_PROTOCOL', 'http'),
+    os.environ.get('ELASTIC_HOST', '127.0.0.1'),
+    os.environ.get('ELASTIC_PORT', 9200),
+)]
+ELASTIC_INDEX_NAME = os.environ.get('ELASTIC_INDEX_NAME', 'movies')
+# Connections pool size per node, shared by all threads of the worker process
+ELASTIC_CONNECTIONS_PER_NODE = int(os.environ.get('ELASTIC_CONNECTIONS_PER_NODE', 8))
+ELASTIC_REQUEST_TIMEOUT = int(os.environ.get('ELASTIC_REQUEST_TIMEOUT', 10))
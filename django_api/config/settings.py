@@ -3,7 +3,8 @@ from split_settings.tools import include
 
 
 load_dotenv()
-include('components/database.py', 'components/apps.py', 'components/common.py')
+include('components/database.py', 'components/apps.py', 'components/common.py', 'components/cache.py',
+        'components/elastic.py')
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
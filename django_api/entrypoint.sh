@@ -20,6 +20,7 @@ su web
 
 python manage.py migrate --fake movies
 python manage.py migrate
+python manage.py refresh_film_works_read
 
 python manage.py createsuperuser --noinput --username admin --email admin@admin.com
 
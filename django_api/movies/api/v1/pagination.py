@@ -1,8 +1,90 @@
 import math
+import uuid
+import datetime
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from typing import Optional
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator, Page, EmptyPage
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
+from movies.cache import get_movies_count_cache_key
+from movies.models import FilmWorkRead
+
+
+def get_film_works_count() -> int:
+    """
+    Returns cached total count of film works from the read model table the list is paged from (the estimate from
+    Postgres statistics is used for the large table if the threshold is set)
+    """
+
+    cache_key = get_movies_count_cache_key()
+    count = cache.get(cache_key)
+    if count is not None:
+        return count
+
+    if settings.API_COUNT_ESTIMATE_THRESHOLD:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                           [FilmWorkRead._meta.db_table.replace('"."', ".")])
+            row = cursor.fetchone()
+        if row and row[0] > settings.API_COUNT_ESTIMATE_THRESHOLD:
+            count = row[0]
+    if count is None:
+        count = FilmWorkRead.objects.count()
+    cache.set(cache_key, count, timeout=settings.API_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class FilmWorkPage(Page):
+    """
+    Page knowing if the next page exists by the fetched rows instead of the (possibly estimated) count
+    """
+
+    def __init__(self, object_list, number, paginator, has_next: bool):
+        super().__init__(object_list, number, paginator)
+        self.__has_next = has_next
+
+    def has_next(self) -> bool:
+        return self.__has_next
+
+
+class FilmWorkCountPaginator(Paginator):
+    """
+    Paginator counting the read model table without the list query annotations
+
+    The count may be cached or estimated, so it is used for the displayed count and total pages only: pages past
+    the last one by the count are allowed and the page existence is checked by the fetched rows
+    """
+
+    @cached_property
+    def count(self) -> int:
+        return get_film_works_count()
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if int(number) > self.num_pages:
+                return int(number)
+            raise
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        # One more row is fetched to know if the next page exists
+        object_list = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not object_list and number > 1:
+            raise EmptyPage(_("That page contains no results"))
+        return FilmWorkPage(object_list[:self.per_page], number, self, has_next=len(object_list) > self.per_page)
+
 
 class NumberPaginationNoLinks(PageNumberPagination):
     """
@@ -21,3 +103,102 @@ class NumberPaginationNoLinks(PageNumberPagination):
             "next": self.page.next_page_number() if self.page.has_next() else None,
             "results": data
         })
+
+
+class NumberOrCursorPaginationNoLinks(NumberPaginationNoLinks):
+    """
+    Pagination class for custom params in response with optional keyset pagination by (created, id)
+
+    Keyset pagination is used if the cursor query param is provided (empty for the first page), "prev" and "next"
+    are opaque cursors in this case. The key columns must be NOT NULL (film works without creation time get the epoch
+    in the read model), otherwise such rows are skipped by the key comparison
+    """
+
+    django_paginator_class = FilmWorkCountPaginator
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self):
+        self.cursor_mode = False
+        self.count = None
+        self.prev_cursor = None
+        self.next_cursor = None
+
+    @staticmethod
+    def encode_cursor(created: datetime.datetime, pk: uuid.UUID, reverse: bool) -> str:
+        """
+        Makes opaque cursor from the position and direction
+        """
+
+        position = f"{'-' if reverse else '+'}{created.isoformat()}|{pk}"
+        return urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, cursor: str) -> Optional[tuple[datetime.datetime, uuid.UUID, bool]]:
+        """
+        Receives the position and direction from opaque cursor
+        """
+
+        if not cursor:
+            return None
+        try:
+            position = urlsafe_b64decode(cursor.encode()).decode()
+            created, pk = position[1:].split("|")
+            return datetime.datetime.fromisoformat(created), uuid.UUID(pk), position[0] == "-"
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.cursor_mode = True
+        self.request = request
+        page_size = self.get_page_size(request)
+        self.count = get_film_works_count()
+
+        position = self.decode_cursor(request.query_params[self.cursor_query_param])
+        reverse = position[2] if position else False
+        if position and reverse:
+            created, pk, _ = position
+            queryset = (queryset.filter(Q(created__lt=created) | Q(created=created, id__lt=pk))
+                        .order_by("-created", "-id"))
+        elif position:
+            created, pk, _ = position
+            queryset = (queryset.filter(Q(created__gt=created) | Q(created=created, id__gt=pk))
+                        .order_by("created", "id"))
+        else:
+            queryset = queryset.order_by("created", "id")
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        has_next = has_more if not reverse else position is not None
+        has_prev = has_more if reverse else position is not None
+        self.next_cursor = self.encode_cursor(*self.get_position(results[-1]), False) if results and has_next else None
+        self.prev_cursor = self.encode_cursor(*self.get_position(results[0]), True) if results and has_prev else None
+        return results
+
+    @staticmethod
+    def get_position(item) -> tuple[datetime.datetime, uuid.UUID]:
+        """
+        Returns the keyset position of the model object or the row fetched with .values()
+        """
+
+        if isinstance(item, dict):
+            return item["created"], item["id"]
+        return item.created, item.id
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+
+        return Response({
+            "count": self.count,
+            "total_pages": math.ceil(self.count / self.page_size),
+            "prev": self.prev_cursor,
+            "next": self.next_cursor,
+            "results": data
+        })
@@ -0,0 +1,24 @@
+import orjson
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+
+
+def _default(obj):
+    """
+    Serializes objects unsupported by orjson natively
+    """
+
+    if isinstance(obj, Promise):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSON renderer based on orjson (UUID, date and datetime objects are serialized natively)
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return orjson.dumps(data, default=_default)
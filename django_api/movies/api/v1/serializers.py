@@ -1,6 +1,9 @@
+from operator import itemgetter
+
 from rest_framework import serializers
 
-from movies.models import FilmWork
+from movies.models import FilmWorkRead
+from movies.search import SORT_FIELDS
 
 
 class FilmWorkSerializer(serializers.ModelSerializer):
@@ -8,13 +11,8 @@ class FilmWorkSerializer(serializers.ModelSerializer):
     Serializer for list and detail film work serialization
     """
 
-    genres = serializers.ListField(source="filmwork_genres")
-    actors = serializers.ListField(source="filmwork_actors")
-    directors = serializers.ListField(source="filmwork_directors")
-    writers = serializers.ListField(source="filmwork_writers")
-
     class Meta:
-        model = FilmWork
+        model = FilmWorkRead
         fields = (
             "id",
             "title",
@@ -27,3 +25,61 @@ class FilmWorkSerializer(serializers.ModelSerializer):
             "directors",
             "writers"
         )
+
+
+class FilmWorkValuesSerializer:
+    """
+    Lean serializer for list and detail film work rows fetched with .values() (fields are picked by precompiled getter
+    without DRF fields machinery, values are left for the renderer)
+    """
+
+    fields = FilmWorkSerializer.Meta.fields
+    _get_fields = itemgetter(*fields)
+
+    def __init__(self, instance=None, many=False, **kwargs):
+        self.instance = instance
+        self.many = many
+
+    def to_representation(self, row: dict) -> dict:
+        return dict(zip(self.fields, self._get_fields(row)))
+
+    @property
+    def data(self):
+        if self.many:
+            return [self.to_representation(row) for row in self.instance]
+        return self.to_representation(self.instance)
+
+
+class MoviesSearchParamsSerializer(serializers.Serializer):
+    """
+    Serializer for movies search query params validation
+    """
+
+    query = serializers.CharField(required=False, allow_blank=True)
+    genre = serializers.ListField(child=serializers.CharField(), required=False, source="genres")
+    person = serializers.UUIDField(required=False)
+    rating_from = serializers.FloatField(required=False, min_value=0, max_value=100)
+    rating_to = serializers.FloatField(required=False, min_value=0, max_value=100)
+    sort = serializers.ChoiceField(choices=[f"{prefix}{field}" for field in SORT_FIELDS for prefix in ("", "-")],
+                                   required=False)
+    page = serializers.IntegerField(required=False, min_value=1, default=1)
+
+    def validate(self, attrs):
+        if attrs.get("rating_from", 0) > attrs.get("rating_to", 100):
+            raise serializers.ValidationError({"rating_from": "Ensure this value is less than or equal to rating_to."})
+        return attrs
+
+
+class FilmWorkSearchSerializer(serializers.Serializer):
+    """
+    Serializer for film work documents found in Elasticsearch
+    """
+
+    id = serializers.UUIDField()
+    title = serializers.CharField()
+    description = serializers.CharField(allow_blank=True)
+    rating = serializers.FloatField(source="imdb_rating", allow_null=True)
+    genres = serializers.ListField()
+    actors = serializers.ListField(source="actors_names")
+    directors = serializers.ListField(source="directors_names")
+    writers = serializers.ListField(source="writers_names")
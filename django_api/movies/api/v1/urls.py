@@ -5,5 +5,6 @@ from . import views
 
 urlpatterns = [
     path('movies/', views.MoviesListApiView.as_view()),
+    path('movies/search/', views.MoviesSearchApiView.as_view()),
     path('movies/<uuid:pk>/', views.MoviesDetailApiView.as_view()),
 ]
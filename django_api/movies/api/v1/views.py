@@ -1,10 +1,29 @@
-from django.contrib.postgres.aggregates import ArrayAgg
-from django.db.models import Q
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from elasticsearch import ApiError, TransportError
+from rest_framework.exceptions import APIException, NotFound
 from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from movies.cache import (get_movies_list_cache_key, get_movie_cache_key, get_data_etag, get_movie_etag,
+                          get_movie_last_modified)
+from movies.models import FilmWorkRead
+from movies.search import search_movies
+from .pagination import NumberOrCursorPaginationNoLinks, NumberPaginationNoLinks
+from .serializers import (FilmWorkSerializer, FilmWorkValuesSerializer, MoviesSearchParamsSerializer,
+                          FilmWorkSearchSerializer)
 
-from movies.models import FilmWork
-from movies.models import PersonFilmWork
-from .serializers import FilmWorkSerializer
+
+class SearchUnavailable(APIException):
+    status_code = 503
+    default_detail = "Search service temporarily unavailable, try again later."
+    default_code = "search_unavailable"
 
 
 class MoviesApiMixin:
@@ -13,26 +32,92 @@ class MoviesApiMixin:
     """
 
     serializer_class = FilmWorkSerializer
-    queryset = (FilmWork.objects.prefetch_related("genres", "persons")
-                .annotate(filmwork_genres=ArrayAgg("genres__name", distinct=True))
-                .annotate(filmwork_actors=ArrayAgg("persons__full_name", distinct=True,
-                                                   filter=Q(personfilmwork__role=PersonFilmWork.RolesList.ACTOR.value)))
-                .annotate(filmwork_directors=ArrayAgg("persons__full_name", distinct=True,
-                                                      filter=Q(personfilmwork__role=
-                                                               PersonFilmWork.RolesList.DIRECTOR.value)))
-                .annotate(filmwork_writers=ArrayAgg("persons__full_name", distinct=True,
-                                                    filter=Q(personfilmwork__role=
-                                                             PersonFilmWork.RolesList.WRITER.value)))
-                ).order_by("created")
+    queryset = FilmWorkRead.objects.order_by("created", "id")
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if settings.API_FAST_SERIALIZATION:
+            # "created" is required for cursor pagination
+            return queryset.values(*FilmWorkValuesSerializer.fields, "created")
+        return queryset
+
+    def get_serializer_class(self):
+        if settings.API_FAST_SERIALIZATION:
+            return FilmWorkValuesSerializer
+        return super().get_serializer_class()
 
 
 class MoviesListApiView(MoviesApiMixin, ListAPIView):
     """
-    FilmWork model objects list view
+    FilmWork model objects list view (ETag is the hash of the page content cached along with it)
     """
 
+    pagination_class = NumberOrCursorPaginationNoLinks
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator.cursor_query_param in request.query_params:
+            page_key = f"cursor:{request.query_params[self.paginator.cursor_query_param]}"
+        else:
+            page_key = f"page:{request.query_params.get(self.paginator.page_query_param, '1')}"
+        cache_key = get_movies_list_cache_key(page_key)
+        cached = cache.get(cache_key)
+        if cached is None:
+            data = super().list(request, *args, **kwargs).data
+            cached = (data, get_data_etag(data))
+            cache.set(cache_key, cached, settings.API_CACHE_TIMEOUT)
+        data, etag = cached
+        not_modified_response = get_conditional_response(request, etag=etag)
+        if not_modified_response is not None:
+            return not_modified_response
+        return Response(data, headers={"ETag": etag})
 
+
+@method_decorator(condition(etag_func=lambda request, pk: get_movie_etag(pk),
+                            last_modified_func=lambda request, pk: get_movie_last_modified(pk)), name="get")
 class MoviesDetailApiView(MoviesApiMixin, RetrieveAPIView):
     """
     FilmWork model objects detail view
     """
+
+    def retrieve(self, request, *args, **kwargs):
+        cache_key = get_movie_cache_key(kwargs[self.lookup_field])
+        data = cache.get(cache_key)
+        if data is None:
+            data = super().retrieve(request, *args, **kwargs).data
+            cache.set(cache_key, data, settings.API_CACHE_TIMEOUT)
+        return Response(data)
+
+
+class MoviesSearchApiView(APIView):
+    """
+    Film works full text search and filtering view (served from Elasticsearch)
+    """
+
+    page_size = NumberPaginationNoLinks.page_size
+    # Elasticsearch default index.max_result_window
+    max_result_window = 10000
+
+    def get(self, request, *args, **kwargs):
+        params_serializer = MoviesSearchParamsSerializer(data=request.query_params)
+        params_serializer.is_valid(raise_exception=True)
+        params = dict(params_serializer.validated_data)
+        page = params.pop("page")
+        if "person" in params:
+            params["person"] = str(params["person"])
+        if page * self.page_size > self.max_result_window:
+            raise NotFound("Invalid page.")
+
+        try:
+            count, documents = search_movies(offset=(page - 1) * self.page_size, limit=self.page_size, **params)
+        except (TransportError, ApiError):
+            # ApiError is raised e.g. if the index isn't created by ETL yet
+            raise SearchUnavailable()
+
+        total_pages = math.ceil(min(count, self.max_result_window) / self.page_size)
+        return Response({
+            "count": count,
+            "total_pages": total_pages,
+            "prev": page - 1 if page > 1 else None,
+            "next": page + 1 if page < total_pages else None,
+            "results": FilmWorkSearchSerializer(documents, many=True).data
+        })
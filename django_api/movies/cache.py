@@ -0,0 +1,137 @@
+import json
+import time
+import uuid
+import hashlib
+import datetime
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Greatest
+from django.utils.http import quote_etag
+
+from .models import FilmWork, GenreFilmWork, PersonFilmWork
+
+# Version keys: the common one is bumped on genres and persons changes (affects any film work), the list one and
+# the film work one are bumped on changes of film work and its genres and persons relations
+MOVIES_VERSION_KEY = "movies:version"
+MOVIES_LIST_VERSION_KEY = "movies:list:version"
+FILM_WORK_VERSION_KEY = "movies:film_work:{}:version"
+
+
+def get_versions(keys: list[str]) -> list[int]:
+    """
+    Returns current values of provided version keys (missing versions are initialized)
+    """
+
+    versions = cache.get_many(keys)
+    missing_keys = [key for key in keys if key not in versions]
+    if missing_keys:
+        # Time based initial value never repeats the value of evicted version key
+        for key in missing_keys:
+            cache.add(key, time.time_ns(), timeout=None)
+        versions.update(cache.get_many(missing_keys))
+    return [versions.get(key, 0) for key in keys]
+
+
+def bump_versions(keys: list[str]) -> None:
+    """
+    Increments provided version keys
+    """
+
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def get_movies_list_cache_key(page_key: str) -> str:
+    """
+    Returns cache key of film works list page (by page number or cursor)
+    """
+
+    movies_version, list_version = get_versions([MOVIES_VERSION_KEY, MOVIES_LIST_VERSION_KEY])
+    return f"movies:list:{movies_version}:{list_version}:{page_key}"
+
+
+def get_movies_count_cache_key() -> str:
+    """
+    Returns cache key of film works total count
+    """
+
+    list_version, = get_versions([MOVIES_LIST_VERSION_KEY])
+    return f"movies:count:{list_version}"
+
+
+def get_movie_cache_key(film_work_id: uuid.UUID) -> str:
+    """
+    Returns cache key of film work detail
+    """
+
+    movies_version, film_work_version = get_versions([MOVIES_VERSION_KEY, FILM_WORK_VERSION_KEY.format(film_work_id)])
+    return f"movies:detail:{film_work_id}:{movies_version}:{film_work_version}"
+
+
+def get_data_etag(data) -> str:
+    """
+    Returns ETag of the response data: hash of its content, so it changes with any change of the data (including
+    the changes made outside of the ORM, which don't bump the versions)
+    """
+
+    content = json.dumps(data, sort_keys=True, default=str).encode()
+    return quote_etag(hashlib.md5(content, usedforsecurity=False).hexdigest())
+
+
+def get_movie_last_modified(film_work_id: uuid.UUID) -> Optional[datetime.datetime]:
+    """
+    Returns cached last modification time of the film work including its genres and persons (None if the film work
+    doesn't exist)
+    """
+
+    movies_version, film_work_version = get_versions([MOVIES_VERSION_KEY, FILM_WORK_VERSION_KEY.format(film_work_id)])
+    cache_key = f"movies:last_modified:{film_work_id}:{movies_version}:{film_work_version}"
+    last_modified = cache.get(cache_key)
+    if last_modified is None:
+        genres_modified = (GenreFilmWork.objects.filter(film_work=OuterRef("pk")).values("film_work")
+                           .annotate(last_modified=Max(Greatest("created", "genre__modified")))
+                           .values("last_modified"))
+        persons_modified = (PersonFilmWork.objects.filter(film_work=OuterRef("pk")).values("film_work")
+                            .annotate(last_modified=Max(Greatest("created", "person__modified")))
+                            .values("last_modified"))
+        # Film work absence is cached as well (as False)
+        last_modified = (FilmWork.objects.filter(pk=film_work_id)
+                         .annotate(last_modified=Greatest("modified", Subquery(genres_modified),
+                                                          Subquery(persons_modified)))
+                         .values_list("last_modified", flat=True).first()) or False
+        cache.set(cache_key, last_modified, settings.API_CACHE_TIMEOUT)
+    return last_modified or None
+
+
+def get_movie_etag(film_work_id: uuid.UUID) -> Optional[str]:
+    """
+    Returns film work detail ETag (None if the film work doesn't exist)
+    """
+
+    last_modified = get_movie_last_modified(film_work_id)
+    if last_modified is None:
+        return None
+    movies_version, film_work_version = get_versions([MOVIES_VERSION_KEY, FILM_WORK_VERSION_KEY.format(film_work_id)])
+    return f"{film_work_id}.{int(last_modified.timestamp())}.{movies_version}.{film_work_version}"
+
+
+def invalidate_film_work(film_work_id: uuid.UUID) -> None:
+    """
+    Invalidates cached film work detail and film works list pages
+    """
+
+    bump_versions([MOVIES_LIST_VERSION_KEY, FILM_WORK_VERSION_KEY.format(film_work_id)])
+
+
+def invalidate_movies() -> None:
+    """
+    Invalidates all cached film works responses
+    """
+
+    bump_versions([MOVIES_VERSION_KEY])
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.cache import invalidate_movies
+from movies.models import FilmWorkRead
+
+
+class Command(BaseCommand):
+    help = "Refreshes queued film works in the denormalized read model (each batch in its own short transaction)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Enqueue all film works before refreshing")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Film works to refresh per transaction")
+        parser.add_argument("--interval", type=float, default=None,
+                            help="Keep draining the queue every provided number of seconds (background job mode)")
+
+    def handle(self, *args, **options):
+        if options["full"]:
+            FilmWorkRead.objects.enqueue_all()
+        refreshed = FilmWorkRead.objects.refresh(options["batch_size"])
+        # The queue is filled by any writes (not only through the ORM), so cached responses are invalidated here too
+        if refreshed:
+            invalidate_movies()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed film works: {refreshed}"))
+
+        while options["interval"]:
+            time.sleep(options["interval"])
+            refreshed = FilmWorkRead.objects.refresh(options["batch_size"])
+            if refreshed:
+                invalidate_movies()
+                self.stdout.write(f"Refreshed film works: {refreshed}")
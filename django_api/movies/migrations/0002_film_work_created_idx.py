@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='filmwork',
+            index=models.Index(fields=['created', 'id'], name='film_work_created_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.11 on 2026-10-18 17:14
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0002_film_work_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmWorkRead',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False)),
+                ('title', models.TextField(verbose_name='name')),
+                ('description', models.TextField(verbose_name='description')),
+                ('creation_date', models.DateField(verbose_name='creation_date')),
+                ('rating', models.FloatField(verbose_name='rating')),
+                ('type', models.CharField(choices=[('movie', 'Movie'), ('tv_show', 'TV Show')], max_length=7, verbose_name='type')),
+                ('created', models.DateTimeField(verbose_name='created')),
+                ('genres', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None)),
+                ('actors', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None)),
+                ('directors', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None)),
+                ('writers', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None)),
+            ],
+            options={
+                'verbose_name': 'Film work read model',
+                'verbose_name_plural': 'Film works read model',
+                'db_table': 'content"."film_work_read',
+                'managed': False,
+            },
+        ),
+    ]
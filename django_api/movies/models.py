@@ -1,6 +1,8 @@
 import uuid
+from typing import Optional
 
-from django.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.db import models, connection
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 
@@ -66,6 +68,7 @@ class FilmWork(UUIDMixin, TimeStampedMixin):
         db_table = "content\".\"film_work"
         verbose_name = _("Film work")
         verbose_name_plural = _("Film works")
+        indexes = [models.Index(fields=["created", "id"], name="film_work_created_idx")]
 
 
 class GenreFilmWork(UUIDMixin):
@@ -101,3 +104,65 @@ class PersonFilmWork(UUIDMixin):
 
     def __str__(self):
         return f"_(Persons in film work) {self.film_work}"
+
+
+class FilmWorkReadManager(models.Manager):
+    def refresh(self,
+                batch_size: int = 1000,
+                film_work_ids: Optional[list[uuid.UUID]] = None,
+                max_batches: Optional[int] = None) -> int:
+        """
+        Refreshes read model rows of queued film works by batches (only of the provided ones if any and not more than
+        max batches if set), returns the number of refreshed film works
+        """
+
+        target_ids = [str(film_work_id) for film_work_id in film_work_ids] if film_work_ids is not None else None
+        refreshed = 0
+        batches = 0
+        with connection.cursor() as cursor:
+            while max_batches is None or batches < max_batches:
+                cursor.execute("SELECT content.refresh_film_work_read(%s, %s::uuid[])", [batch_size, target_ids])
+                batch_refreshed = cursor.fetchone()[0]
+                if not batch_refreshed:
+                    break
+                refreshed += batch_refreshed
+                batches += 1
+        return refreshed
+
+    def enqueue_all(self) -> None:
+        """
+        Enqueues all film works (and stale read model rows) for refresh
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO content.film_work_read_queue (film_work_id) "
+                           "SELECT id FROM content.film_work UNION SELECT id FROM content.film_work_read")
+
+
+class FilmWorkRead(models.Model):
+    """
+    Denormalized film work read model, maintained in Postgres by the content tables triggers
+    """
+
+    id = models.UUIDField(primary_key=True)
+    title = models.TextField(_("name"))
+    description = models.TextField(_("description"))
+    creation_date = models.DateField(_("creation_date"))
+    rating = models.FloatField(_("rating"))
+    type = models.CharField(_("type"), max_length=7, choices=FilmWork.FilmWorkType.choices)
+    created = models.DateTimeField(_("created"))
+    genres = ArrayField(models.TextField())
+    actors = ArrayField(models.TextField())
+    directors = ArrayField(models.TextField())
+    writers = ArrayField(models.TextField())
+
+    objects = FilmWorkReadManager()
+
+    def __str__(self):
+        return self.title
+
+    class Meta:
+        managed = False
+        db_table = "content\".\"film_work_read"
+        verbose_name = _("Film work read model")
+        verbose_name_plural = _("Film works read model")
@@ -0,0 +1,77 @@
+import threading
+from typing import Optional
+
+from django.conf import settings
+from elasticsearch import Elasticsearch
+
+SEARCH_FIELDS = ["title^3", "description", "actors_names", "directors_names", "writers_names"]
+SORT_FIELDS = {"rating": "imdb_rating", "title": "title.raw"}
+PERSON_ROLES = ("actors", "directors", "writers")
+
+# One client (with its connections pool) per worker process shared by all its threads, uwsgi works with lazy-apps so
+# the client is never inherited by forked workers
+_elastic_client: Optional[Elasticsearch] = None
+_elastic_client_lock = threading.Lock()
+
+
+def get_elastic_client() -> Elasticsearch:
+    """
+    Returns shared Elasticsearch client (lazily created)
+    """
+
+    global _elastic_client
+    if _elastic_client is None:
+        with _elastic_client_lock:
+            if _elastic_client is None:
+                _elastic_client = Elasticsearch(settings.ELASTIC_HOSTS,
+                                                connections_per_node=settings.ELASTIC_CONNECTIONS_PER_NODE,
+                                                request_timeout=settings.ELASTIC_REQUEST_TIMEOUT)
+    return _elastic_client
+
+
+def compile_search_query(query: Optional[str] = None, genres: Optional[list[str]] = None,
+                         person: Optional[str] = None, rating_from: Optional[float] = None,
+                         rating_to: Optional[float] = None) -> dict:
+    """
+    Compiles bool query: full text search over titles, descriptions and persons names and the filters (not scored)
+    """
+
+    must = [{"multi_match": {"query": query, "fields": SEARCH_FIELDS}}] if query else [{"match_all": {}}]
+    filters = []
+    if genres:
+        filters.append({"terms": {"genres": genres}})
+    if person:
+        filters.append({"bool": {
+            "should": [{"nested": {"path": role, "query": {"term": {f"{role}.id": person}}}} for role in PERSON_ROLES],
+            "minimum_should_match": 1
+        }})
+    if rating_from is not None or rating_to is not None:
+        rating_range = {}
+        if rating_from is not None:
+            rating_range["gte"] = rating_from
+        if rating_to is not None:
+            rating_range["lte"] = rating_to
+        filters.append({"range": {"imdb_rating": rating_range}})
+    return {"bool": {"must": must, "filter": filters}}
+
+
+def compile_search_sort(sort: Optional[str] = None) -> list:
+    """
+    Compiles sorting by the field name with optional "-" prefix for the descending order (relevance by default)
+    """
+
+    if not sort:
+        return ["_score", {"id": "asc"}]
+    field = SORT_FIELDS[sort.lstrip("-")]
+    return [{field: "desc" if sort.startswith("-") else "asc"}, {"id": "asc"}]
+
+
+def search_movies(offset: int, limit: int, sort: Optional[str] = None, **filters) -> tuple[int, list[dict]]:
+    """
+    Searches film works in Elasticsearch, returns total hits count and found documents
+    """
+
+    response = get_elastic_client().search(index=settings.ELASTIC_INDEX_NAME, query=compile_search_query(**filters),
+                                           sort=compile_search_sort(sort), from_=offset, size=limit,
+                                           track_total_hits=True, source_excludes=["actors", "directors", "writers"])
+    return response["hits"]["total"]["value"], [hit["_source"] for hit in response["hits"]["hits"]]
@@ -0,0 +1,32 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import invalidate_film_work, invalidate_movies
+from .models import Genre, Person, FilmWork, GenreFilmWork, PersonFilmWork, FilmWorkRead
+
+# Read model is refreshed before the cache invalidation (on commit callbacks are executed in the registration order).
+# Only the changed film work is refreshed within the request (or one batch of the queue for genres and persons changes
+# affecting many film works), the rest of the queue is drained by the refresh_film_works_read command
+
+
+@receiver([post_save, post_delete], sender=FilmWork)
+def film_work_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(FilmWorkRead.objects.refresh, film_work_ids=[instance.id]))
+    transaction.on_commit(lambda: invalidate_film_work(instance.id))
+
+
+@receiver([post_save, post_delete], sender=GenreFilmWork)
+@receiver([post_save, post_delete], sender=PersonFilmWork)
+def film_work_relation_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(FilmWorkRead.objects.refresh, film_work_ids=[instance.film_work_id]))
+    transaction.on_commit(lambda: invalidate_film_work(instance.film_work_id))
+
+
+@receiver([post_save, post_delete], sender=Genre)
+@receiver([post_save, post_delete], sender=Person)
+def film_work_related_entity_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(FilmWorkRead.objects.refresh, max_batches=1))
+    transaction.on_commit(invalidate_movies)
@@ -1,15 +1,17 @@
 import os
+import time
 import json
 from json import JSONDecodeError
 import logging
-from typing import Optional, Any
+from typing import Optional, Any, Iterator
 
 from elastic_transport import ObjectApiResponse
 from elasticsearch import Elasticsearch, TransportError, ApiError
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import parallel_bulk, streaming_bulk
 
 from common.modifiers import Singleton, backoff
 from common.serializers import ElasticFilmWorkSerializer
+from settings import app_settings
 
 
 class ElasticClient(metaclass=Singleton):
@@ -17,10 +19,18 @@ class ElasticClient(metaclass=Singleton):
     Client class for interacting with Elasticsearch
     """
 
-    def __init__(self, elastic_dsn: str, elastic_index_name: str, logger: logging.Logger):
+    def __init__(self,
+                 elastic_dsn: str,
+                 elastic_index_name: str,
+                 logger: logging.Logger,
+                 health_check_interval: int = 60
+                 ):
         self.__elastic_dsn: str = elastic_dsn
         self.__elastic_index_name: str = elastic_index_name
         self.__client: Optional[Elasticsearch] = None
+        self.__client_pid: Optional[int] = None
+        self.__checked_at: Optional[float] = None
+        self.__health_check_interval: int = health_check_interval
         self.__logger: logging.Logger = logger
         self.__execution_valid_methods: Optional[list] = None
 
@@ -31,13 +41,33 @@ class ElasticClient(metaclass=Singleton):
     @property
     def connection(self) -> Elasticsearch:
         """
-        Returns connection to Elastic
+        Returns long-lived connection to Elastic
+
+        The connection is established once per process (the one inherited by forked process is never used) and is
+        checked only after a failure or when the health check interval passes.
         """
 
-        if not hasattr(self, "__client"):
+        if self.__client is None or self.__client_pid != os.getpid():
             self.__client = self.__get_elastic_connection()
+            self.__client_pid = os.getpid()
+            self.__checked_at = time.monotonic()
+        elif self.__checked_at is None or time.monotonic() - self.__checked_at >= self.__health_check_interval:
+            if not self.__client.ping():
+                self.__logger.error("Elasticsearch connection health check failed, reconnecting")
+                self.close()
+                return self.connection
+            self.__checked_at = time.monotonic()
         return self.__client
 
+    def close(self) -> None:
+        """
+        Closes connection to Elastic
+        """
+
+        if self.__client is not None and self.__client_pid == os.getpid():
+            self.__client.close()
+        self.__client, self.__client_pid, self.__checked_at = None, None, None
+
     def __get_valid_methods(self) -> list:
         """
         Returns the list of available methods for external call
@@ -66,6 +96,8 @@ class ElasticClient(metaclass=Singleton):
 
             return getattr(self, f"_{command}")(self.connection, *args, **kwargs)
         except TransportError as exception:
+            # Connection is checked before the next try
+            self.__checked_at = None
             self.__logger.error(f"An error while trying to establish connection to "
                                 f"Elasticsearch using DSN: {self.__elastic_dsn}")
             raise exception
@@ -128,11 +160,19 @@ class ElasticClient(metaclass=Singleton):
 
         if not elastic_client.indices.exists(index=self.__elastic_index_name):
             try:
-                created = elastic_client.indices.create(index=self.__elastic_index_name, body=mapping)
+                index_name = f"{self.__elastic_index_name}_v1"
+                mapping["aliases"] = {self.__elastic_index_name: {}}
+                created = elastic_client.indices.create(index=index_name, body=mapping)
                 if created:
-                    self.__logger.debug(f"Successfully created index {self.__elastic_index_name}")
+                    self.__logger.debug(f"Successfully created index {index_name} "
+                                        f"with alias {self.__elastic_index_name}")
                     return created
             except ApiError as exception:
+                # Concurrent workers (e.g. of different shards) may create the index at the same time
+                error = exception.body.get("error") if isinstance(exception.body, dict) else None
+                if isinstance(error, dict) and error.get("type") == "resource_already_exists_exception":
+                    self.__logger.debug(f"Index {index_name} is already created by another worker")
+                    return
                 self.__logger.error("Can't create index - an error in index name of other ES exception")
                 raise exception
             except TransportError as exception:
@@ -140,16 +180,139 @@ class ElasticClient(metaclass=Singleton):
                                     f"Elasticsearch connection error using DSN: {self.__elastic_dsn}")
                 raise exception
 
-    def _load_data(self, elastic_client: Elasticsearch, data: list[ElasticFilmWorkSerializer]) -> tuple:
+    def __get_next_index_version(self, elastic_client: Elasticsearch) -> int:
+        """
+        Returns the number of the next version of the index
+        """
+
+        versions = [0]
+        for index_name in elastic_client.indices.get(index=f"{self.__elastic_index_name}_v*"):
+            version = index_name.removeprefix(f"{self.__elastic_index_name}_v")
+            if version.isdigit():
+                versions.append(int(version))
+        return max(versions) + 1
+
+    def _create_reindex_index(self, elastic_client: Elasticsearch, path_to_schema: str) -> Optional[str]:
+        """
+        Creates the next version of the index with settings optimized for bulk loading and returns its name
+        """
+
+        mapping = self.__load_index_schema_mapping(path_to_schema)
+
+        if not mapping:
+            return
+
+        # Refresh and replication are turned off until the index is fully loaded
+        mapping.setdefault("settings", {}).update({"refresh_interval": "-1", "number_of_replicas": 0})
+        try:
+            index_name = f"{self.__elastic_index_name}_v{self.__get_next_index_version(elastic_client)}"
+            elastic_client.indices.create(index=index_name, body=mapping)
+        except ApiError as exception:
+            self.__logger.error("Can't create index for reindexing - an error in index name of other ES exception")
+            raise exception
+        except TransportError as exception:
+            self.__logger.error(f"An error while trying to create index - "
+                                f"Elasticsearch connection error using DSN: {self.__elastic_dsn}")
+            raise exception
+        self.__logger.debug(f"Successfully created index {index_name} for reindexing")
+        return index_name
+
+    def _publish_index(self, elastic_client: Elasticsearch, index_name: str, path_to_schema: str) -> Optional[list]:
+        """
+        Restores the settings of the loaded index and atomically switches the alias to it
+
+        Returns the names of the indexes previously used by the alias
+        """
+
+        mapping = self.__load_index_schema_mapping(path_to_schema)
+
+        if not mapping:
+            return
+
+        index_settings = mapping.get("settings", {})
+        alias_name = self.__elastic_index_name
+        long_running_client = elastic_client.options(request_timeout=app_settings.ELASTIC_REINDEX_REQUEST_TIMEOUT)
+        try:
+            long_running_client.indices.forcemerge(index=index_name, max_num_segments=1)
+            elastic_client.indices.put_settings(index=index_name, settings={
+                "refresh_interval": index_settings.get("refresh_interval", "1s"),
+                "number_of_replicas": index_settings.get("number_of_replicas", 1)
+            })
+            elastic_client.indices.refresh(index=index_name)
+
+            actions = [{"add": {"index": index_name, "alias": alias_name}}]
+            if elastic_client.indices.exists_alias(name=alias_name):
+                previous_indexes = list(elastic_client.indices.get_alias(name=alias_name))
+                actions.insert(0, {"remove": {"index": "*", "alias": alias_name}})
+            elif elastic_client.indices.exists(index=alias_name):
+                # The index created before aliases were used is replaced within the same atomic operation
+                previous_indexes = [alias_name]
+                actions.insert(0, {"remove_index": {"index": alias_name}})
+            else:
+                previous_indexes = []
+            elastic_client.indices.update_aliases(actions=actions)
+            self.__logger.debug(f"Successfully switched alias {alias_name} to index {index_name}")
+
+            if app_settings.ELASTIC_DELETE_OLD_INDEXES:
+                for previous_index in previous_indexes:
+                    if previous_index != alias_name:
+                        elastic_client.indices.delete(index=previous_index)
+                        self.__logger.debug(f"Deleted previous index {previous_index}")
+        except ApiError as exception:
+            self.__logger.error(f"Can't publish index {index_name} - ES exception")
+            raise exception
+        except TransportError as exception:
+            self.__logger.error(f"An error while trying to publish index - "
+                                f"Elasticsearch connection error using DSN: {self.__elastic_dsn}")
+            raise exception
+        return previous_indexes
+
+    def __generate_documents(self, data: list[ElasticFilmWorkSerializer], index_name: str) -> Iterator[dict]:
+        """
+        Yields bulk actions for provided data records
+        """
+
+        for row in data:
+            yield {"_index": index_name, "_id": row.id, "_source": row.json()}
+
+    def __bulk_upload(self,
+                      elastic_client: Elasticsearch,
+                      data: list[ElasticFilmWorkSerializer],
+                      index_name: str
+                      ) -> Iterator[tuple]:
+        """
+        Uploads provided data records by chunks and yields the result for every document
+        """
+
+        bulk_options = {
+            "chunk_size": app_settings.ELASTIC_BULK_CHUNK_SIZE,
+            "max_chunk_bytes": app_settings.ELASTIC_BULK_MAX_CHUNK_BYTES,
+            "raise_on_error": False
+        }
+        if app_settings.ELASTIC_BULK_THREADS > 1:
+            return parallel_bulk(elastic_client, self.__generate_documents(data, index_name),
+                                 thread_count=app_settings.ELASTIC_BULK_THREADS, **bulk_options)
+        return streaming_bulk(elastic_client, self.__generate_documents(data, index_name), **bulk_options)
+
+    def _load_data(self,
+                   elastic_client: Elasticsearch,
+                   data: list[ElasticFilmWorkSerializer],
+                   index_name: Optional[str] = None
+                   ) -> tuple:
         """
-        Loads provided data records to Elasticsearch
+        Loads provided data records to Elasticsearch (to the index alias if the target index is not provided)
         """
 
-        documents = [{"_index": self.__elastic_index_name, "_id": row.id, "_source": row.json()} for row in data]
+        loaded, failed = 0, []
         try:
-            loaded_data = bulk(elastic_client, documents)
-            self.__logger.debug(f"Successfully uploaded to Elasticsearch {loaded_data[0]} film work objects ")
-            return loaded_data
+            for uploaded, result in self.__bulk_upload(elastic_client, data, index_name or self.__elastic_index_name):
+                if uploaded:
+                    loaded += 1
+                    continue
+                failed.append(result)
+                action_result = next(iter(result.values()), {})
+                self.__logger.error(f"Failed to upload film work object {action_result.get('_id')} "
+                                    f"to Elasticsearch: {action_result.get('error')}")
         except ApiError as exception:
             self.__logger.error("An error in data uploading")
             raise exception
@@ -157,3 +320,6 @@ class ElasticClient(metaclass=Singleton):
             self.__logger.error(f"An error while trying to upload data to index - "
                                 f"Elasticsearch connection error using DSN: {self.__elastic_dsn}")
             raise exception
+        self.__logger.debug(f"Successfully uploaded to Elasticsearch {loaded} film work objects "
+                            f"({len(failed)} failed)")
+        return loaded, failed
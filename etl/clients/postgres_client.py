@@ -1,12 +1,16 @@
+import time
 import logging
-from typing import Optional, Union
+import select
+from typing import Optional, Union, Iterator
 from contextlib import contextmanager
 
 import psycopg2
 from psycopg2.extras import DictCursor
-from psycopg2.extensions import connection
+from psycopg2.extensions import connection, TRANSACTION_STATUS_UNKNOWN
+from psycopg2.pool import ThreadedConnectionPool
 
 from common.modifiers import backoff
+from common.constants import KEYSET_START_KEY
 
 
 class PostgresClient:
@@ -14,10 +18,26 @@ class PostgresClient:
     Client class for interacting with Postgres
     """
 
-    def __init__(self, postgres_dns: dict, postgres_schema: str, chunk_size: int, logger: logging.Logger):
+    def __init__(self,
+                 postgres_dns: dict,
+                 postgres_schema: str,
+                 chunk_size: int,
+                 logger: logging.Logger,
+                 cursor_itersize: int = 2000,
+                 pool_min_size: int = 2,
+                 pool_max_size: int = 4,
+                 health_check_interval: int = 30
+                 ):
         self.__postgres_dsn: dict = postgres_dns
         self.__postgres_schema: str = postgres_schema
         self.__query_chunk_size: int = chunk_size
+        self.__cursor_itersize: int = cursor_itersize
+        self.__pool_min_size: int = pool_min_size
+        self.__pool_max_size: int = pool_max_size
+        self.__pool: Optional[ThreadedConnectionPool] = None
+        self.__health_check_interval: int = health_check_interval
+        # (backend pid, check time) of the last server-side check by pooled connection id
+        self.__connections_checked_at: dict[int, tuple[int, float]] = {}
         self.__logger: logging.Logger = logger
 
     @property
@@ -25,10 +45,85 @@ class PostgresClient:
         return self.__logger
 
     @backoff(exceptions=(psycopg2.Error,))
+    def __get_pool(self) -> ThreadedConnectionPool:
+        """
+        Returns Postgres connection pool (establishes it if it doesn't exist yet)
+        """
+
+        if self.__pool is None or self.__pool.closed:
+            try:
+                self.__pool = ThreadedConnectionPool(self.__pool_min_size, self.__pool_max_size,
+                                                     **self.__postgres_dsn, cursor_factory=DictCursor)
+            except psycopg2.Error as exception:
+                self.__logger.error(f"Can't establish connection to Postgres "
+                                    f"with provided credentials: {self.__postgres_dsn}")
+                raise exception
+        return self.__pool
+
+    @staticmethod
+    def __is_connection_alive(conn: connection) -> bool:
+        """
+        Checks if pooled connection is still usable (by its local state only)
+        """
+
+        return not conn.closed and conn.info.transaction_status != TRANSACTION_STATUS_UNKNOWN
+
+    def __is_server_connection_alive(self, conn: connection) -> bool:
+        """
+        Checks if pooled connection is still usable on the server side with a cheap query (not more often than once
+        per health check interval for every connection)
+        """
+
+        if not self.__is_connection_alive(conn):
+            return False
+        checked_at = self.__connections_checked_at.get(id(conn))
+        if checked_at and checked_at[0] == conn.info.backend_pid \
+                and time.monotonic() - checked_at[1] < self.__health_check_interval:
+            return True
+        try:
+            with conn.cursor() as curs:
+                curs.execute("SELECT 1;")
+            conn.rollback()
+        except psycopg2.Error:
+            self.__logger.debug("Pooled Postgres connection is broken, reconnecting")
+            return False
+        self.__connections_checked_at[id(conn)] = (conn.info.backend_pid, time.monotonic())
+        return True
+
+    @contextmanager
+    def __get_db_connection(self) -> Iterator[connection]:
+        """
+        Yields Postgres connection instance from the pool and returns it back after using
+
+        Broken connections are dropped from the pool, so the next try gets a new one.
+        """
+
+        pool = self.__get_pool()
+        conn = pool.getconn()
+        while not self.__is_server_connection_alive(conn):
+            self.__connections_checked_at.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+        connection_broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as exception:
+            connection_broken = True
+            self.__logger.error("An error while trying to connect to Postgres")
+            raise exception
+        except psycopg2.Error as exception:
+            self.__logger.error("An error while executing query in Postgres")
+            raise exception
+        finally:
+            close_connection = connection_broken or not self.__is_connection_alive(conn)
+            if close_connection:
+                self.__connections_checked_at.pop(id(conn), None)
+            pool.putconn(conn, close=close_connection)
+
     @contextmanager
-    def __get_db_connection(self) -> Optional[connection]:
+    def __get_dedicated_db_connection(self) -> Iterator[connection]:
         """
-        Yields Postgres connection instance
+        Yields Postgres connection instance not shared with the pool (for long-living sessions)
         """
 
         try:
@@ -49,6 +144,15 @@ class PostgresClient:
             except UnboundLocalError:
                 pass
 
+    def close(self) -> None:
+        """
+        Closes all the pooled connections
+        """
+
+        if self.__pool is not None and not self.__pool.closed:
+            self.__pool.closeall()
+        self.__connections_checked_at.clear()
+
     def __make_dicts_from_query(self, columns: list, query_result: list) -> list[dict]:
         """
         Makes list of dicts from query results
@@ -69,17 +173,31 @@ class PostgresClient:
         return results_as_dicts
 
     @backoff(exceptions=(psycopg2.Error,))
-    def perform_db_action(self, query: str, items_ids: Optional[list] = None, flat: bool = True) -> Union[list, dict]:
+    def perform_db_action(self,
+                          query: str,
+                          items_ids: Optional[list] = None,
+                          flat: bool = True,
+                          keyset: Optional[tuple[str, str]] = None,
+                          start_key: Optional[tuple[str, str]] = None
+                          ) -> Union[list, dict]:
         """
         Executes query in Postgres
+
+        By default the query is paged with LIMIT/OFFSET and its "{}" placeholder receives the offset. If the keyset
+        column names are provided the query is paged by the (modified, id) key instead: its two last placeholders
+        receive the key of the last row of the previous page (or the start key for the first page), so every page is
+        an index seek.
         """
 
         with self.__get_db_connection() as conn:
             query_result = []
             curs = conn.cursor()
             offset = 0
+            last_key = start_key or KEYSET_START_KEY
             while True:
-                if items_ids:
+                if keyset:
+                    curs.execute(query, [*(items_ids or []), *last_key])
+                elif items_ids:
                     curs.execute(query.format(offset), items_ids)
                 else:
                     curs.execute(query.format(offset))
@@ -88,12 +206,99 @@ class PostgresClient:
                     break
                 if flat:
                     for result_item in chunk_results:
-                        query_result.append(*result_item)
+                        query_result.append(result_item[0])
                 else:
                     query_result.extend(chunk_results)
-                offset += self.__query_chunk_size
+                if keyset:
+                    last_key = tuple(chunk_results[-1][column] for column in keyset)
+                else:
+                    offset += self.__query_chunk_size
             if flat:
                 return query_result
             else:
                 columns = list(curs.description)
                 return self.__make_dicts_from_query(columns, query_result)
+
+    @backoff(exceptions=(psycopg2.Error,))
+    def __fetch_page(self, query: str, params: list) -> list[dict]:
+        """
+        Executes the query of one keyset page in Postgres and returns its results as a list of dicts
+        """
+
+        with self.__get_db_connection() as conn:
+            curs = conn.cursor()
+            curs.execute(query, params)
+            return self.__make_dicts_from_query(list(curs.description), curs.fetchall())
+
+    def page_db_action(self,
+                       query: str,
+                       keyset: tuple[str, str],
+                       items_ids: Optional[list] = None,
+                       start_key: Optional[tuple[str, str]] = None
+                       ) -> Iterator[list[dict]]:
+        """
+        Executes query in Postgres paged by the (modified, id) key (as perform_db_action does) and yields every page
+        as a list of dicts, so the caller can checkpoint after each of them
+
+        Every page is fetched (and retried after a fail) separately, so the paging is resumed from the key of the last
+        yielded page instead of starting over.
+        """
+
+        last_key = start_key or KEYSET_START_KEY
+        while page := self.__fetch_page(query, [*(items_ids or []), *last_key]):
+            last_key = tuple(page[-1][column] for column in keyset)
+            yield page
+
+    @backoff(exceptions=(psycopg2.Error,))
+    def stream_db_action(self,
+                         query: str,
+                         items_ids: Optional[list] = None,
+                         group_by: Optional[str] = None
+                         ) -> Iterator[list[dict]]:
+        """
+        Executes query in Postgres using server-side cursor and yields query results by batches of dicts
+
+        If the group column name is provided, records with the same value of this column are never split between
+        different batches (query results should be ordered by this column). The query is re-executed from the beginning
+        after a fail, so the batches yielded before it are yielded again (loading them is idempotent).
+        """
+
+        with self.__get_db_connection() as conn:
+            curs = conn.cursor(name="etl_stream_cursor")
+            curs.itersize = self.__cursor_itersize
+            curs.execute(query, items_ids)
+            pending = []
+            while chunk_results := curs.fetchmany(self.__query_chunk_size):
+                pending.extend(self.__make_dicts_from_query(list(curs.description), chunk_results))
+                if group_by:
+                    # Holding back the records of the last group, as it may continue in the next chunk
+                    split_at = len(pending)
+                    last_group = pending[-1][group_by]
+                    while split_at and pending[split_at - 1][group_by] == last_group:
+                        split_at -= 1
+                    batch, pending = pending[:split_at], pending[split_at:]
+                else:
+                    batch, pending = pending, []
+                if batch:
+                    yield batch
+            if pending:
+                yield pending
+            curs.close()
+
+    def listen(self, channel: str, timeout: float) -> Iterator[list[str]]:
+        """
+        Listens for notifications on provided channel and yields the payloads received within every timeout
+        (empty list if nothing was received)
+        """
+
+        with self.__get_dedicated_db_connection() as conn:
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {channel};")
+            self.__logger.debug(f"Listening for notifications on channel {channel}")
+            while True:
+                payloads = []
+                if select.select([conn], [], [], timeout) != ([], [], []):
+                    conn.poll()
+                    while conn.notifies:
+                        payloads.append(conn.notifies.pop(0).payload)
+                yield payloads
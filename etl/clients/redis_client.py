@@ -1,7 +1,8 @@
 import logging
-from typing import Optional, Any
+from typing import Optional, Any, Callable
 
 from redis import Redis, ConnectionPool, RedisError
+from redis.client import Pipeline
 from redis.commands.core import ResponseT
 
 from common.modifiers import Singleton, backoff
@@ -12,9 +13,10 @@ class RedisClient(metaclass=Singleton):
     Redis client
     """
 
-    def __init__(self, host: str, port: int, logger: logging.Logger):
+    def __init__(self, host: str, port: int, logger: logging.Logger, health_check_interval: int = 30):
         self.__host: str = host
         self.__port: int = port
+        self.__health_check_interval: int = health_check_interval
         self.__logger: logging.Logger = logger
         self.__connection: Optional[Redis] = None
 
@@ -25,10 +27,13 @@ class RedisClient(metaclass=Singleton):
     @property
     def connection(self) -> Redis:
         """
-        Returns connection to Redis
+        Returns long-lived connection to Redis
+
+        The connections pool resets itself in forked process, idle connections are checked only after the health check
+        interval passes.
         """
 
-        if not hasattr(self, "__connection"):
+        if self.__connection is None:
             self.__get_connection()
         return self.__connection
 
@@ -38,9 +43,18 @@ class RedisClient(metaclass=Singleton):
         Tries to establish Redis connection
         """
 
-        pool = ConnectionPool(host=self.__host, port=self.__port)
+        pool = ConnectionPool(host=self.__host, port=self.__port, health_check_interval=self.__health_check_interval)
         self.__connection = Redis(connection_pool=pool)
 
+    def close(self) -> None:
+        """
+        Closes all the pooled connections
+        """
+
+        if self.__connection is not None:
+            self.__connection.connection_pool.disconnect()
+            self.__connection = None
+
     @backoff(exceptions=(RedisError,))
     def get(self, key: str) -> ResponseT:
         """
@@ -50,9 +64,89 @@ class RedisClient(metaclass=Singleton):
         return self.connection.get(key)
 
     @backoff(exceptions=(RedisError,))
-    def set(self, key: str, value: Any) -> ResponseT:
+    def set(self, key: str, value: Any, **kwargs) -> ResponseT:
+        """
+        Set the provided value for the provided key (SET options like nx and ex are passed as is)
+        """
+
+        return self.connection.set(key, value, **kwargs)
+
+    @backoff(exceptions=(RedisError,))
+    def delete(self, *keys: str) -> ResponseT:
+        """
+        Deletes provided keys
+        """
+
+        return self.connection.delete(*keys)
+
+    @backoff(exceptions=(RedisError,))
+    def eval(self, script: str, keys: list, args: list) -> ResponseT:
+        """
+        Executes Lua script atomically
+        """
+
+        return self.connection.eval(script, len(keys), *keys, *args)
+
+    @backoff(exceptions=(RedisError,))
+    def add_and_count(self, key: str, member: Any, ttl: Optional[int] = None) -> int:
+        """
+        Adds the member to the set (setting its time to live if provided) and returns the set size within one MULTI
+        """
+
+        with self.connection.pipeline(transaction=True) as pipeline:
+            pipeline.sadd(key, member)
+            if ttl:
+                pipeline.expire(key, ttl)
+            count = pipeline.scard(key).execute()[-1]
+        return count
+
+    @backoff(exceptions=(RedisError,))
+    def expire(self, key: str, ttl: int) -> ResponseT:
+        """
+        Sets time to live of the key
         """
-        Set the provided value for the provided key
+
+        return self.connection.expire(key, ttl)
+
+    @backoff(exceptions=(RedisError,))
+    def exists(self, *keys: str) -> ResponseT:
+        """
+        Checks if the keys exist (returns the number of existing ones)
+        """
+
+        return self.connection.exists(*keys)
+
+    @backoff(exceptions=(RedisError,))
+    def hget(self, name: str, key: str) -> ResponseT:
+        """
+        Gets the value of the hash field
+        """
+
+        return self.connection.hget(name, key)
+
+    @backoff(exceptions=(RedisError,))
+    def hgetall(self, name: str) -> ResponseT:
+        """
+        Gets all the fields and values of the hash
+        """
+
+        return self.connection.hgetall(name)
+
+    @backoff(exceptions=(RedisError,))
+    def hset(self, name: str, mapping: dict) -> ResponseT:
+        """
+        Sets the provided fields of the hash (in a single command)
+        """
+
+        return self.connection.hset(name, mapping=mapping)
+
+    @backoff(exceptions=(RedisError,))
+    def transaction(self, func: Callable[[Pipeline], Any], *watches: str) -> Any:
+        """
+        Executes the function in optimistic transaction: the function reads watched keys with the provided pipeline,
+        queues commands after pipeline.multi() and is retried if watched keys were changed before EXEC
+
+        Returns the value returned by the function
         """
 
-        return self.connection.set(key, value)
+        return self.connection.transaction(func, *watches, value_from_callable=True)
@@ -1,6 +1,23 @@
 from enum import StrEnum
 
 
+# entity name of film work changes notifications (changes in film work and its links with genres and persons)
+FILM_WORK_ENTITY: str = "film_work"
+
+# changes notifications channel (fixed, the same name is used by the notifying triggers in movies_database.sql)
+NOTIFY_CHANNEL: str = "etl_changes"
+
+
 class Entities(StrEnum):
     GENRE = "genre"
     PERSON = "person"
+
+
+class Roles(StrEnum):
+    DIRECTOR = "director"
+    ACTOR = "actor"
+    WRITER = "writer"
+
+
+# (modified, id) key preceding any existing row, used as the first page key in keyset pagination
+KEYSET_START_KEY: tuple[str, str] = ("-infinity", "00000000-0000-0000-0000-000000000000")
@@ -1,4 +1,5 @@
 import time
+import inspect
 from functools import wraps
 
 
@@ -11,9 +12,18 @@ def backoff(
 ):
     """
     Re-executes the function after a potential fail while not succeed
+
+    Generator functions are re-executed from the beginning, so the items yielded before the fail are yielded again.
     """
 
     def func_wrapper(func):
+        def retry_after_fail(logger, n: int, sleep_time: float) -> float:
+            if logger:
+                logger.error(f"An error in executing {func.__name__}. Retrying in {sleep_time} sec.")
+            time.sleep(sleep_time)
+            new_delta = start_sleep_time * (factor ** n)
+            return new_delta if new_delta < border_sleep_time else border_sleep_time
+
         @wraps(func)
         def inner(*args, **kwargs):
             logger = getattr(args[0], "logger") if hasattr(args[0], "logger") else None
@@ -24,12 +34,22 @@ def backoff(
                 try:
                     return func(*args, **kwargs)
                 except exceptions:
-                    if logger:
-                        logger.error(f"An error in executing {func.__name__}. Retrying in {sleep_time} sec.")
-                    time.sleep(sleep_time)
-                    new_delta = start_sleep_time * (factor ** n)
-                    sleep_time = new_delta if new_delta < border_sleep_time else border_sleep_time
-        return inner
+                    sleep_time = retry_after_fail(logger, n, sleep_time)
+
+        @wraps(func)
+        def generator_inner(*args, **kwargs):
+            logger = getattr(args[0], "logger") if hasattr(args[0], "logger") else None
+            sleep_time = start_sleep_time
+            n = 0
+            while n <= max_attempts:
+                n += 1
+                try:
+                    yield from func(*args, **kwargs)
+                    return
+                except exceptions:
+                    sleep_time = retry_after_fail(logger, n, sleep_time)
+
+        return generator_inner if inspect.isgeneratorfunction(func) else inner
     return func_wrapper
 
 
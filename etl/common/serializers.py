@@ -14,7 +14,7 @@ class PostgresFilmWorkSerializer(BaseModel):
     role: str | None = ""
     person_id: str | None = ""
     full_name: str | None = ""
-    genres: str
+    genres: str | None = ""
     genres_list: list = []
     director_names: list = []
     actor_names: list = []
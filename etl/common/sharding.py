@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import uuid
+import random
+import datetime
+import socket
+import logging
+import threading
+from typing import Optional, Callable
+
+from clients.redis_client import RedisClient
+
+# Lease is renewed or released only by its owner
+RENEW_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("EXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class ShardLeaseLost(Exception):
+    """
+    Raised when the shard lease was expired and possibly taken by another worker
+    """
+
+
+class ReindexAborted(Exception):
+    """
+    Raised when the full reindex can't be finished, as the worker of some shard is gone
+    """
+
+
+class ShardsNotCovered(Exception):
+    """
+    Raised when some shards are not held by any worker, so their film works would never be processed
+    """
+
+
+def get_shard_id_range(shard: int, shards_count: int) -> tuple[str, Optional[str]]:
+    """
+    Returns the film work ids range of the shard: ids space is split into equal ranges, so every shard is an index range
+    scan and random uuids are spread evenly (the upper bound of the last shard is None)
+    """
+
+    lower_bound = str(uuid.UUID(int=shard * 2 ** 128 // shards_count))
+    upper_bound = str(uuid.UUID(int=(shard + 1) * 2 ** 128 // shards_count)) if shard + 1 < shards_count else None
+    return lower_bound, upper_bound
+
+
+class ShardCoordinator:
+    """
+    Coordinates sharded ETL workers through Redis: every worker holds a lease of one of the film work ids ranges
+    (renewed in background while the worker is alive), full reindex target index is shared by all the shards
+    """
+
+    def __init__(self,
+                 redis_client: RedisClient,
+                 shards_count: int,
+                 lease_ttl: int,
+                 key_prefix: str,
+                 logger: logging.Logger
+                 ):
+        self.__redis_client: RedisClient = redis_client
+        self.__shards_count: int = shards_count
+        self.__lease_ttl: int = lease_ttl
+        self.__key_prefix: str = key_prefix
+        self.__logger: logging.Logger = logger
+        self.__worker_id: str = f"{socket.gethostname()}:{os.getpid()}"
+        self.__shard: Optional[int] = None
+        self.__lease_lost: threading.Event = threading.Event()
+        self.__renewing_stopped: threading.Event = threading.Event()
+        # reindex coordination keys expire unless renewed by the workers taking part in the reindex
+        self.__reindex_keys: set[str] = set()
+
+    @property
+    def logger(self) -> logging.Logger:
+        return self.__logger
+
+    @property
+    def shard(self) -> Optional[int]:
+        return self.__shard
+
+    @property
+    def shards_count(self) -> int:
+        return self.__shards_count
+
+    @property
+    def id_range(self) -> tuple[str, Optional[str]]:
+        return get_shard_id_range(self.__shard, self.__shards_count)
+
+    def __lease_key(self, shard: int) -> str:
+        return f"{self.__key_prefix}:shards:{self.__shards_count}:{shard}:lease"
+
+    def __reindex_key(self, name: str) -> str:
+        return f"{self.__key_prefix}:reindex:{self.__shards_count}:{name}"
+
+    def count_held_shards(self) -> int:
+        """
+        Returns the number of shards held by the workers (of all the nodes)
+        """
+
+        return self.__redis_client.exists(*(self.__lease_key(shard) for shard in range(self.__shards_count)))
+
+    def wait_all_shards_held(self, timeout: float) -> None:
+        """
+        Waits until every shard is held by some worker (of this or other nodes started at the same time), raises
+        the exception if some shards are still free after the timeout
+        """
+
+        deadline = time.monotonic() + timeout
+        while (held_shards := self.count_held_shards()) < self.__shards_count:
+            if time.monotonic() >= deadline:
+                raise ShardsNotCovered(f"Only {held_shards} of {self.__shards_count} shards are held by the workers")
+            self.__logger.debug(f"{held_shards} of {self.__shards_count} shards are held, waiting for other workers")
+            time.sleep(1)
+
+    def acquire(self) -> int:
+        """
+        Acquires the lease of any free shard (waits until some shard is free) and starts renewing it
+        """
+
+        while True:
+            for shard in random.sample(range(self.__shards_count), self.__shards_count):
+                if self.__redis_client.set(self.__lease_key(shard), self.__worker_id, nx=True, ex=self.__lease_ttl):
+                    self.__shard = shard
+                    self.__logger.debug(f"Worker {self.__worker_id} acquired shard {shard + 1}/{self.__shards_count}")
+                    threading.Thread(target=self.__renew_lease, daemon=True).start()
+                    return shard
+            self.__logger.debug(f"All {self.__shards_count} shards are taken, waiting for a free one")
+            time.sleep(self.__lease_ttl / 2)
+
+    def __renew_lease(self) -> None:
+        """
+        Renews the lease until it is released (marks it as lost if it was taken by another worker), reports the shards
+        left without workers (e.g. after another node is stopped)
+        """
+
+        shards_not_covered = False
+        while not self.__renewing_stopped.wait(self.__lease_ttl / 3):
+            if not self.__redis_client.eval(RENEW_LEASE_SCRIPT, [self.__lease_key(self.__shard)],
+                                            [self.__worker_id, self.__lease_ttl]):
+                self.__logger.error(f"Lease of shard {self.__shard + 1}/{self.__shards_count} is lost")
+                self.__lease_lost.set()
+                return
+            for key in list(self.__reindex_keys):
+                self.__redis_client.expire(key, self.__lease_ttl)
+            held_shards = self.count_held_shards()
+            if held_shards < self.__shards_count and not shards_not_covered:
+                self.__logger.error(f"Only {held_shards} of {self.__shards_count} shards are held by the workers, "
+                                    f"film works of the other shards are not processed")
+            shards_not_covered = held_shards < self.__shards_count
+
+    def ensure_held(self) -> None:
+        """
+        Raises the exception if the lease is lost, so the worker never processes the shard of another worker
+        """
+
+        if self.__lease_lost.is_set():
+            raise ShardLeaseLost(f"Lease of shard {self.__shard + 1}/{self.__shards_count} is lost")
+
+    def release(self) -> None:
+        """
+        Stops renewing and releases the lease
+        """
+
+        self.__renewing_stopped.set()
+        if self.__shard is not None and not self.__lease_lost.is_set():
+            self.__redis_client.eval(RELEASE_LEASE_SCRIPT, [self.__lease_key(self.__shard)], [self.__worker_id])
+
+    def get_reindex_target(self, create_index: Callable[[], Optional[str]]) -> tuple[Optional[str], Optional[str]]:
+        """
+        Returns the index name and start time of the full reindex shared by all the shards (the first worker creates
+        the index, the others wait for it)
+
+        The target expires unless renewed by the workers of the reindex, so the target of the aborted reindex is never
+        reused by the next one.
+        """
+
+        target_key = self.__reindex_key("target")
+        lock_key = self.__reindex_key("lock")
+        while True:
+            target = self.__redis_client.get(target_key)
+            if target:
+                target = json.loads(target)
+                self.__reindex_keys.add(target_key)
+                return target["index_name"], target["started_at"]
+            if self.__redis_client.set(lock_key, self.__worker_id, nx=True, ex=self.__lease_ttl):
+                started_at = datetime.datetime.utcnow().isoformat()
+                index_name = create_index()
+                if index_name:
+                    self.__redis_client.set(target_key, json.dumps({"index_name": index_name,
+                                                                    "started_at": started_at}),
+                                            ex=self.__lease_ttl)
+                    self.__reindex_keys.add(target_key)
+                return index_name, started_at
+            self.ensure_held()
+            time.sleep(1)
+
+    def complete_reindex_shard(self, index_name: str) -> bool:
+        """
+        Marks the shard as loaded into the reindex target, returns True for the last loaded shard (its worker publishes
+        the index, so the reindex coordination state is cleared)
+        """
+
+        done_key = self.__reindex_key(f"{index_name}:done")
+        self.__reindex_keys.add(done_key)
+        if self.__redis_client.add_and_count(done_key, self.__shard, self.__lease_ttl) == self.__shards_count:
+            self.__redis_client.delete(done_key, self.__reindex_key("target"), self.__reindex_key("lock"))
+            self.__reindex_keys.clear()
+            return True
+        return False
+
+    def publish_reindex(self, index_name: str) -> None:
+        """
+        Notifies the workers of the other shards that the reindex target is published
+        """
+
+        self.__redis_client.set(self.__reindex_key("published"), index_name, ex=24 * 60 * 60)
+
+    def __is_reindex_published(self, index_name: str) -> bool:
+        return (self.__redis_client.get(self.__reindex_key("published")) or b"").decode() == index_name
+
+    def wait_reindex_published(self, index_name: str) -> None:
+        """
+        Waits until the reindex target is published by the worker of the last loaded shard, raises the exception
+        if the lease of any shard is gone (its worker has failed, so the index would never be published)
+        """
+
+        try:
+            while not self.__is_reindex_published(index_name):
+                self.ensure_held()
+                if self.count_held_shards() < self.__shards_count and not self.__is_reindex_published(index_name):
+                    raise ReindexAborted(f"Reindex into {index_name} is aborted: the worker of some shard is gone")
+                time.sleep(1)
+        finally:
+            self.__reindex_keys.clear()
@@ -1,11 +1,21 @@
 import abc
 import json
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+
+from redis.client import Pipeline
 
 from clients.redis_client import RedisClient
 from settings import app_settings
 
 
+def _is_advanced(current_value: Any, value: Any) -> bool:
+    """
+    Checks if the value is greater than the current one (values are compared in the form they are stored in)
+    """
+
+    return current_value is None or json.loads(json.dumps(value)) > current_value
+
+
 class BaseStorage(abc.ABC):
     """
     Abstract state handler
@@ -27,6 +37,33 @@ class BaseStorage(abc.ABC):
 
         raise NotImplementedError
 
+    def save_values(self, values: Dict[str, Any]) -> None:
+        """
+        Saves provided values in storage keeping the other saved values
+        """
+
+        state = self.retrieve_state()
+        state.update(values)
+        self.save_state(state)
+
+    def retrieve_value(self, key: str) -> Any:
+        """
+        Receives the value from storage by its key
+        """
+
+        return self.retrieve_state().get(key)
+
+    def advance_values(self, values: Dict[str, Any]) -> Dict[str, bool]:
+        """
+        Saves only the values greater than the saved ones (watermarks), returns if the value was saved for every key
+        """
+
+        state = self.retrieve_state()
+        advanced = {key: _is_advanced(state.get(key), value) for key, value in values.items()}
+        state.update({key: value for key, value in values.items() if advanced[key]})
+        self.save_state(state)
+        return advanced
+
 
 class RedisStorage(BaseStorage):
     """
@@ -55,6 +92,85 @@ class RedisStorage(BaseStorage):
             return {}
 
 
+class RedisHashStorage(BaseStorage):
+    """
+    Class for saving state in Redis hash: every key is a separate hash field, so keys are read and updated separately
+    and atomically
+    """
+
+    def __init__(self, redis_client: RedisClient, legacy_key: Optional[str] = None):
+        self.__redis_client: RedisClient = redis_client
+        self.__key: str = app_settings.REDIS_STATE_HASH_KEY
+        if legacy_key:
+            self.__import_legacy_state(legacy_key)
+
+    def __import_legacy_state(self, legacy_key: str) -> None:
+        """
+        Imports the state saved by RedisStorage if the hash doesn't exist yet
+        """
+
+        if self.__redis_client.exists(self.__key):
+            return
+        legacy_state = self.__redis_client.get(legacy_key)
+        if legacy_state:
+            self.save_state(json.loads(legacy_state))
+
+    def save_state(self, state: Dict[str, Any]) -> None:
+        """
+        Saves state in storage
+        """
+
+        if state:
+            self.__redis_client.hset(self.__key, {key: json.dumps(value) for key, value in state.items()})
+
+    def retrieve_state(self) -> Dict[str, Any]:
+        """
+        Receives state from storage
+        """
+
+        return {key.decode(): json.loads(value) for key, value in self.__redis_client.hgetall(self.__key).items()}
+
+    def save_values(self, values: Dict[str, Any]) -> None:
+        """
+        Saves provided values in storage with a single HSET
+        """
+
+        self.save_state(values)
+
+    def retrieve_value(self, key: str) -> Any:
+        """
+        Receives the value from storage by its key with HGET
+        """
+
+        value = self.__redis_client.hget(self.__key, key)
+        return json.loads(value) if value is not None else None
+
+    def advance_values(self, values: Dict[str, Any]) -> Dict[str, bool]:
+        """
+        Saves only the values greater than the saved ones (watermarks) in the optimistic transaction: the saved values
+        are watched and all the advanced ones are saved within one MULTI, so concurrent processes never move watermarks
+        back
+        """
+
+        if not values:
+            return {}
+        keys = list(values)
+
+        def advance(pipeline: Pipeline) -> Dict[str, bool]:
+            current_values = pipeline.hmget(self.__key, keys)
+            advanced = {
+                key: _is_advanced(json.loads(current_value) if current_value is not None else None, values[key])
+                for key, current_value in zip(keys, current_values)
+            }
+            pipeline.multi()
+            mapping = {key: json.dumps(values[key]) for key in keys if advanced[key]}
+            if mapping:
+                pipeline.hset(self.__key, mapping=mapping)
+            return advanced
+
+        return self.__redis_client.transaction(advance, self.__key)
+
+
 class State:
     """
     Class for handling the system state
@@ -68,14 +184,33 @@ class State:
         Set state for provided key
         """
 
-        actual_state_dict = self.__storage.retrieve_state()
-        actual_state_dict.update({key: value})
-        self.__storage.save_state(actual_state_dict)
+        self.__storage.save_values({key: value})
+
+    def set_states(self, values: Dict[str, Any]) -> None:
+        """
+        Set state for all provided keys at once
+        """
+
+        self.__storage.save_values(values)
 
     def get_state(self, key: str) -> Any:
         """
         Receives state via provided state
         """
 
-        actual_state_dict = self.__storage.retrieve_state()
-        return actual_state_dict.get(key)
+        return self.__storage.retrieve_value(key)
+
+    def advance_state(self, key: str, value: Any) -> bool:
+        """
+        Set state for provided key only if the value is greater than the current one, returns if the state was set
+        """
+
+        return self.__storage.advance_values({key: value})[key]
+
+    def advance_states(self, values: Dict[str, Any]) -> Dict[str, bool]:
+        """
+        Set state for every provided key which value is greater than the current one, returns if the state was set
+        for every key
+        """
+
+        return self.__storage.advance_values(values)
@@ -1,8 +1,12 @@
+import json
+import uuid
 import logging
-from typing import Optional
+from json import JSONDecodeError
+from collections import defaultdict
+from typing import Optional, Iterator
 from datetime import datetime
 
-from common.constants import Entities
+from common.constants import Entities, Roles
 from clients.postgres_client import PostgresClient
 
 
@@ -11,67 +15,259 @@ class Extractor:
     Class for extracting entities from database
     """
 
-    def __init__(self, postgres_client: PostgresClient, postgres_schema: str, chunk_size: int, logger: logging.Logger):
+    def __init__(self,
+                 postgres_client: PostgresClient,
+                 postgres_schema: str,
+                 chunk_size: int,
+                 logger: logging.Logger,
+                 aggregated: bool = False,
+                 id_range: Optional[tuple[str, Optional[str]]] = None
+                 ):
         self.__postgres_schema: str = postgres_schema
         self.__query_chunk_size: int = chunk_size
+        self.__aggregated: bool = aggregated
+        self.__id_range: Optional[tuple[str, Optional[str]]] = id_range
         self.__logger: logging.Logger = logger
         self.__postgres_client: PostgresClient = postgres_client
 
-    def find_changes_in_related_entities(self, entity: Entities, start_date: datetime) -> Optional[list]:
+    def __get_shard_condition(self, alias: str = "") -> str:
         """
-        Loads changed entities according to entity type and receives film work ids
+        Returns the condition for selecting only the film works of the worker shard ids range
         """
 
-        entity_changed_query = (f"SELECT id "
-                                f"FROM {self.__postgres_schema}.{entity} "
-                                f"WHERE modified > '{start_date}' "
-                                f"ORDER BY modified "
-                                f"LIMIT {self.__query_chunk_size} OFFSET {{}};")
+        if not self.__id_range:
+            return "TRUE "
+        lower_bound, upper_bound = self.__id_range
+        if upper_bound is None:
+            return f"{alias}id >= '{lower_bound}' "
+        return f"{alias}id >= '{lower_bound}' AND {alias}id < '{upper_bound}' "
 
-        self.__logger.debug(f"Checking {entity} for changes")
-        entities_changed = self.__postgres_client.perform_db_action(entity_changed_query)
-        self.__logger.debug(f"Found {len(entities_changed)} changes in {entity}")
+    def __compile_related_film_works_query(self, entities_conditions: dict[str, str], film_works_condition: str) -> str:
+        """
+        Returns the query for receiving distinct ids of film works related to the entities matching the conditions
+        """
+
+        related_film_works = " UNION ".join(
+            f"SELECT efw.film_work_id "
+            f"FROM {self.__postgres_schema}.{entity}_film_work efw "
+            f"JOIN {self.__postgres_schema}.{entity} e ON e.id = efw.{entity}_id "
+            f"WHERE {condition}"
+            for entity, condition in entities_conditions.items()
+        )
+        return (f"WITH related_film_works AS ({related_film_works}) "
+                f"SELECT fw.id "
+                f"FROM {self.__postgres_schema}.film_work fw "
+                f"JOIN related_film_works rfw ON rfw.film_work_id = fw.id "
+                f"WHERE {film_works_condition} "
+                f"AND {self.__get_shard_condition('fw.')};")
+
+    def __find_related_film_works(self, query: str, items_ids: Optional[list] = None) -> list:
+        """
+        Receives ids of film works related to the entities by the related film works query
+
+        The query is executed once and its results are read by batches through server-side cursor (paging the query
+        would compute all the related film works for every page again)
+        """
+
+        return [record["id"] for batch in self.__postgres_client.stream_db_action(query, items_ids) for record in batch]
+
+    def find_changes_in_related_entities(self, start_date: datetime) -> list:
+        """
+        Receives ids of film works affected by changes in related entities (genres and persons)
+
+        Film works changed themselves are skipped, as they are extracted by the basic check anyway.
+        """
+
+        film_works_changed_query = self.__compile_related_film_works_query(
+            {entity: f"e.modified > '{start_date}'" for entity in Entities},
+            f"NOT fw.modified > '{start_date}'"
+        )
+
+        self.__logger.debug("Checking related entities for changes")
+        film_works_changed = self.__find_related_film_works(film_works_changed_query)
+        self.__logger.debug(f"Found {len(film_works_changed)} film works affected by changes in related entities")
+        return film_works_changed
+
+    def find_film_works_by_related_entities(self,
+                                            entities_ids: dict[str, list],
+                                            film_works_start_key: Optional[tuple[str, str]] = None
+                                            ) -> list:
+        """
+        Receives ids of film works related to provided entities (by entity name)
+
+        Film works after the (modified, id) start key are skipped if it is provided, as they are extracted by the film
+        works check starting from this key anyway.
+        """
+
+        film_works_condition = "NOT (fw.modified, fw.id) > (%s, %s)" if film_works_start_key else "TRUE"
+        film_works_changed_query = self.__compile_related_film_works_query(
+            {entity: "e.id = ANY(%s::uuid[])" for entity in entities_ids},
+            film_works_condition
+        )
+        film_works_changed = self.__find_related_film_works(film_works_changed_query,
+                                                            [*entities_ids.values(), *(film_works_start_key or ())])
+        self.__logger.debug(f"Found {len(film_works_changed)} film works related to changed "
+                            f"{', '.join(entities_ids)}")
+        return film_works_changed
+
+    def filter_shard_film_works(self, film_works_ids: set[str]) -> set[str]:
+        """
+        Leaves only the film works of the worker shard ids range
+        """
+
+        if not self.__id_range:
+            return film_works_ids
+        lower_bound, upper_bound = (uuid.UUID(bound) if bound else None for bound in self.__id_range)
+        return {
+            film_work_id for film_work_id in film_works_ids
+            if lower_bound <= uuid.UUID(film_work_id) and (upper_bound is None or uuid.UUID(film_work_id) < upper_bound)
+        }
+
+    def listen_changes(self, channel: str, timeout: float) -> Iterator[dict[str, set]]:
+        """
+        Listens for changes notifications and yields changed entities ids by entity name (empty if no changes were
+        notified within the timeout), every notification carries the ids changed by one statement (or a chunk of them)
+        """
 
-        if entities_changed:
-            film_works_changed_query = (f"SELECT fw.id "
-                                        f"FROM {self.__postgres_schema}.film_work fw "
-                                        f"LEFT JOIN {self.__postgres_schema}.{entity}_film_work efw "
-                                        f"ON fw.id = efw.film_work_id "
-                                        f"WHERE efw.{entity}_id IN ({','.join(['%s'] * len(entities_changed))}) "
-                                        f"ORDER BY fw.modified "
-                                        f"LIMIT {self.__query_chunk_size} OFFSET {{}};")
-            film_works_changed = self.__postgres_client.perform_db_action(film_works_changed_query, entities_changed)
-            self.__logger.debug(f"Found {len(film_works_changed)} changed film works "
-                                f"according to changes in {entity}")
-            film_works_changed_records = self.extract_changed_film_works(start_date, film_works_changed)
-            return film_works_changed_records
+        for payloads in self.__postgres_client.listen(channel, timeout):
+            changes = defaultdict(set)
+            for payload in payloads:
+                try:
+                    change = json.loads(payload)
+                    changes[change["entity"]].update(change["ids"])
+                except (JSONDecodeError, KeyError, TypeError):
+                    self.__logger.error(f"Can't parse changes notification with payload {payload}")
+            yield changes
 
-    def extract_changed_film_works(self, start_date: datetime, target_film_works: Optional[list] = None) -> list:
+    def stream_changed_entities(self, entity: str, start_key: tuple[str, str]) -> Iterator[list[dict]]:
         """
-        Loads changed entities according to entity type and receives film work ids
+        Yields ids and modification dates of the entities changed after the (modified, id) start key by batches
+        ordered by this key
         """
 
-        film_work_query = (f"SELECT fw.id as film_work_id, fw.title, fw.description, fw.rating, fw.type, "
-                           f"pfw.role, p.id as person_id, p.full_name, g.name as genres "
-                           f"FROM content.film_work fw "
-                           f"LEFT JOIN content.person_film_work pfw ON pfw.film_work_id = fw.id "
-                           f"LEFT JOIN content.person p ON p.id = pfw.person_id "
-                           f"LEFT JOIN content.genre_film_work gfw ON gfw.film_work_id = fw.id "
-                           f"LEFT JOIN content.genre g ON g.id = "
-                           f"gfw.genre_id ")
+        entities_query = (f"SELECT id, modified FROM {self.__postgres_schema}.{entity} "
+                          f"WHERE (modified, id) > (%s, %s) "
+                          f"ORDER BY modified, id "
+                          f"LIMIT {self.__query_chunk_size};")
+        for entities_batch in self.__postgres_client.page_db_action(entities_query, keyset=("modified", "id"),
+                                                                    start_key=start_key):
+            self.__logger.debug(f"Found batch of {len(entities_batch)} changed {entity} records")
+            yield entities_batch
+
+    def __get_film_works_filter(self,
+                                start_date: datetime,
+                                target_film_works: Optional[list] = None,
+                                start_key: Optional[tuple[str, str]] = None
+                                ) -> str:
+        """
+        Returns the condition for selecting changed film works (of the worker shard only)
+        """
 
         if target_film_works:
-            film_work_query_case = (f"WHERE fw.id IN ({','.join(['%s'] * len(target_film_works))}) "
-                                    f"LIMIT {self.__query_chunk_size} OFFSET {{}}; ")
+            film_works_filter = "id = ANY(%s::uuid[]) "
+        elif start_key:
+            film_works_filter = "(modified, id) > (%s, %s) "
         else:
-            film_work_query_case = (f"WHERE fw.modified > '{start_date}' "
-                                    f"LIMIT {self.__query_chunk_size} OFFSET {{}}; ")
+            film_works_filter = f"modified > '{start_date}' "
+        return f"{film_works_filter}AND {self.__get_shard_condition()}"
 
-        film_work_query += film_work_query_case
-        film_works_changed = self.__postgres_client.perform_db_action(query=film_work_query,
-                                                                      items_ids=target_film_works,
-                                                                      flat=False)
-        if film_works_changed:
-            self.__logger.debug(f"Extracted {len(film_works_changed)} film work records affecting changes ")
+    def __compile_film_work_query(self, film_works_subquery: str) -> str:
+        """
+        Returns the query for extracting film work records with its persons and genres
+        """
 
-        return film_works_changed
+        if self.__aggregated:
+            return self.__compile_aggregated_film_work_query(film_works_subquery)
+
+        return (f"SELECT fw.id as film_work_id, fw.modified, fw.title, fw.description, fw.rating, "
+                f"fw.type, pfw.role, p.id as person_id, p.full_name, g.name as genres "
+                f"FROM {self.__postgres_schema}.film_work fw "
+                f"LEFT JOIN {self.__postgres_schema}.person_film_work pfw ON pfw.film_work_id = fw.id "
+                f"LEFT JOIN {self.__postgres_schema}.person p ON p.id = pfw.person_id "
+                f"LEFT JOIN {self.__postgres_schema}.genre_film_work gfw ON gfw.film_work_id = fw.id "
+                f"LEFT JOIN {self.__postgres_schema}.genre g ON g.id = gfw.genre_id "
+                f"WHERE fw.id IN ({film_works_subquery}) "
+                f"ORDER BY fw.modified, fw.id;")
+
+    def __compile_aggregated_film_work_query(self, film_works_subquery: str) -> str:
+        """
+        Returns the query for extracting film work records with persons and genres aggregated in one record
+        """
+
+        persons_columns = ", ".join(
+            f"COALESCE(jsonb_agg(DISTINCT jsonb_build_object('id', p.id, 'name', p.full_name)) "
+            f"FILTER (WHERE pfw.role = '{role}'), '[]') AS {role}, "
+            f"COALESCE(array_agg(DISTINCT p.full_name) "
+            f"FILTER (WHERE pfw.role = '{role}'), '{{}}') AS {role}_names"
+            for role in Roles
+        )
+
+        # Persons and genres are aggregated in separate subqueries to avoid persons x genres records multiplication
+        return (f"SELECT fw.id as film_work_id, fw.modified, fw.title, fw.description, fw.rating, fw.type, "
+                f"persons.*, genres.genres_list "
+                f"FROM {self.__postgres_schema}.film_work fw "
+                f"LEFT JOIN LATERAL (SELECT {persons_columns} "
+                f"FROM {self.__postgres_schema}.person_film_work pfw "
+                f"JOIN {self.__postgres_schema}.person p ON p.id = pfw.person_id "
+                f"WHERE pfw.film_work_id = fw.id) persons ON TRUE "
+                f"LEFT JOIN LATERAL (SELECT COALESCE(array_agg(DISTINCT g.name), '{{}}') AS genres_list "
+                f"FROM {self.__postgres_schema}.genre_film_work gfw "
+                f"JOIN {self.__postgres_schema}.genre g ON g.id = gfw.genre_id "
+                f"WHERE gfw.film_work_id = fw.id) genres ON TRUE "
+                f"WHERE fw.id IN ({film_works_subquery}) "
+                f"ORDER BY fw.modified, fw.id;")
+
+    def extract_changed_film_works(self,
+                                   start_date: datetime,
+                                   target_film_works: Optional[list] = None,
+                                   start_key: Optional[tuple[str, str]] = None
+                                   ) -> Iterator[list[dict]]:
+        """
+        Yields changed film work records (all changed since start date or the (modified, id) start key or only the
+        provided ones) by keyset pages, so the caller can checkpoint after each of them
+        """
+
+        # Film works are paged by the (modified, id) key in the subquery (starting from the start key), so all the
+        # joined records of every film work are always extracted within the same page
+        film_works_filter = self.__get_shard_condition() if start_key and not target_film_works \
+            else self.__get_film_works_filter(start_date, target_film_works)
+        film_work_query = self.__compile_film_work_query(
+            f"SELECT id FROM {self.__postgres_schema}.film_work "
+            f"WHERE {film_works_filter}"
+            f"AND (modified, id) > (%s, %s) "
+            f"ORDER BY modified, id "
+            f"LIMIT {self.__query_chunk_size}"
+        )
+
+        film_works_ids = [target_film_works] if target_film_works else None
+        for film_works_page in self.__postgres_client.page_db_action(query=film_work_query,
+                                                                     keyset=("modified", "film_work_id"),
+                                                                     items_ids=film_works_ids,
+                                                                     start_key=start_key):
+            self.__logger.debug(f"Extracted page of {len(film_works_page)} film work records affecting changes")
+            yield film_works_page
+
+    def stream_changed_film_works(self,
+                                  start_date: datetime,
+                                  target_film_works: Optional[list] = None,
+                                  start_key: Optional[tuple[str, str]] = None
+                                  ) -> Iterator[list[dict]]:
+        """
+        Yields changed film work records by batches ordered by (modified, id) key (all the records of one film work
+        are in the same batch)
+        """
+
+        film_work_query = self.__compile_film_work_query(
+            f"SELECT id FROM {self.__postgres_schema}.film_work "
+            f"WHERE {self.__get_film_works_filter(start_date, target_film_works, start_key)}"
+        )
+
+        if target_film_works:
+            film_works_ids = [target_film_works]
+        else:
+            film_works_ids = list(start_key) if start_key else None
+        for film_works_batch in self.__postgres_client.stream_db_action(query=film_work_query,
+                                                                        items_ids=film_works_ids,
+                                                                        group_by="film_work_id"):
+            self.__logger.debug(f"Extracted batch of {len(film_works_batch)} film work records affecting changes")
+            yield film_works_batch
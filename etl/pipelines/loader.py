@@ -24,10 +24,29 @@ class ElasticLoader:
         created = self.__elastic_client.execute(command="create_index", path_to_schema=path_to_schema)
         return created
 
-    def load_data(self, transformed_film_works: list[ElasticFilmWorkSerializer]) -> Optional[tuple]:
+    def create_reindex_index(self, path_to_schema: str) -> Optional[str]:
+        """
+        Creates the next Elasticsearch index version for full reindex
+        """
+
+        return self.__elastic_client.execute(command="create_reindex_index", path_to_schema=path_to_schema)
+
+    def publish_index(self, index_name: str, path_to_schema: str) -> Optional[list]:
+        """
+        Switches the Elasticsearch index alias to the provided fully loaded index
+        """
+
+        return self.__elastic_client.execute(command="publish_index", index_name=index_name,
+                                             path_to_schema=path_to_schema)
+
+    def load_data(self,
+                  transformed_film_works: list[ElasticFilmWorkSerializer],
+                  index_name: Optional[str] = None
+                  ) -> Optional[tuple]:
         """
         Loads provided data records to Elasticsearch
         """
 
-        loaded_data = self.__elastic_client.execute(command="load_data", data=transformed_film_works)
+        loaded_data = self.__elastic_client.execute(command="load_data", data=transformed_film_works,
+                                                    index_name=index_name)
         return loaded_data
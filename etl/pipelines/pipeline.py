@@ -1,17 +1,36 @@
+import time
 import datetime
 import logging
-from typing import Optional
+import threading
+from functools import partial
+from collections import defaultdict
+from typing import Optional, Iterator, Callable
+
+import psycopg2
 
 from settings import app_settings
 from pipelines.extractor import Extractor
 from .transformer import FilmWorkMerger, PostgresToElasticTransformer
 from .loader import ElasticLoader
+from .stages import StagedExecutor
 from clients.postgres_client import PostgresClient
 from clients.elastic_client import ElasticClient
-from common.constants import Entities
+from common.constants import Entities, FILM_WORK_ENTITY, KEYSET_START_KEY, NOTIFY_CHANNEL
+from common.modifiers import backoff
+from common.sharding import ShardCoordinator
 from common.state_handler import State
 
 
+def _make_watermark(modified: datetime.datetime, entity_id: str) -> list[str]:
+    """
+    Makes (modified, id) watermark in the form comparable as stored in the state (UTC time with microseconds)
+    """
+
+    if modified.tzinfo is None:
+        modified = modified.replace(tzinfo=datetime.timezone.utc)
+    return [modified.astimezone(datetime.timezone.utc).isoformat(timespec="microseconds"), str(entity_id)]
+
+
 class Pipeline:
     """
     Class for performing ETL pipeline
@@ -24,25 +43,40 @@ class Pipeline:
                  elastic_dsn: str,
                  elastic_index_name: str,
                  logger: logging.Logger,
-                 state_handler: State
+                 state_handler: State,
+                 shard_coordinator: Optional[ShardCoordinator] = None
                  ):
 
         self.__logger: logging.Logger = logger
         self.__state_handler: State = state_handler
+        self.__shard_coordinator: Optional[ShardCoordinator] = shard_coordinator
+        self.__postgres_client: Optional[PostgresClient] = None
 
         self.__extractor: Extractor = self.__get_extractor(postgres_dns, postgres_schema, chunk_size)
         self.__merger: FilmWorkMerger = self.__get_merger()
         self.__transformer: PostgresToElasticTransformer = self.__get_transformer()
         self.__elastic_client: Optional[ElasticClient] = None
         self.__loader: ElasticLoader = self.__get_loader(elastic_dsn, elastic_index_name)
+        self.__executor: Optional[StagedExecutor] = self.__get_executor()
+
+    @property
+    def logger(self) -> logging.Logger:
+        return self.__logger
 
     def __get_extractor(self, postgres_dns: dict, postgres_schema: str, chunk_size: int) -> Extractor:
         """
         Gets the instance of extractor class
         """
 
-        postgres_client = PostgresClient(postgres_dns, postgres_schema, chunk_size, self.__logger)
-        return Extractor(postgres_client, postgres_schema, chunk_size, self.__logger)
+        postgres_client = PostgresClient(postgres_dns, postgres_schema, chunk_size, self.__logger,
+                                         app_settings.DB_CURSOR_ITERSIZE,
+                                         app_settings.POSTGRES_POOL_MIN_SIZE,
+                                         app_settings.POSTGRES_POOL_MAX_SIZE,
+                                         app_settings.POSTGRES_HEALTH_CHECK_INTERVAL)
+        self.__postgres_client = postgres_client
+        return Extractor(postgres_client, postgres_schema, chunk_size, self.__logger,
+                         app_settings.DB_AGGREGATED_EXTRACTION,
+                         self.__shard_coordinator.id_range if self.__shard_coordinator else None)
 
     def __get_merger(self) -> FilmWorkMerger:
         """
@@ -63,38 +97,224 @@ class Pipeline:
         Gets the instance if loader class
         """
 
-        elastic_client = ElasticClient(elastic_dsn, elastic_index_name, self.__logger)
+        elastic_client = ElasticClient(elastic_dsn, elastic_index_name, self.__logger,
+                                       app_settings.ELASTIC_HEALTH_CHECK_INTERVAL)
         self.__elastic_client = elastic_client
         return ElasticLoader(elastic_client, self.__logger)
 
-    def __do_basic_pipeline(self, start_date: datetime.datetime, target_film_works: Optional[list] = None) -> None:
+    def __get_executor(self) -> Optional[StagedExecutor]:
+        """
+        Gets the instance of staged executor class (None if the stages are performed sequentially)
+        """
+
+        if not app_settings.ETL_PIPELINED_STAGES:
+            return None
+        return StagedExecutor(app_settings.ETL_STAGE_QUEUE_SIZE, self.__logger)
+
+    def close(self) -> None:
         """
-        Performs database check based on film work records
+        Closes Postgres and Elasticsearch connections
         """
 
-        if not target_film_works:
-            extracted_film_works = self.__extractor.extract_changed_film_works(start_date, target_film_works)
+        self.__postgres_client.close()
+        self.__elastic_client.close()
+
+    def __extract_film_works(self,
+                             start_date: datetime.datetime,
+                             target_film_works: Optional[list] = None,
+                             start_key: Optional[tuple[str, str]] = None
+                             ) -> Iterator[list[dict]]:
+        """
+        Yields extracted film work records by batches (by keyset pages if streaming extraction is turned off)
+        """
+
+        if app_settings.DB_STREAMING_EXTRACTION:
+            yield from self.__extractor.stream_changed_film_works(start_date, target_film_works, start_key)
+        else:
+            yield from self.__extractor.extract_changed_film_works(start_date, target_film_works, start_key)
+
+    def __merge_film_works(self, batch: tuple[list[dict], Optional[Callable]]
+                           ) -> tuple[Optional[dict], Optional[Callable]]:
+        """
+        Merges the batch of extracted film work records
+        """
+
+        extracted_film_works, on_loaded = batch
+        if app_settings.DB_AGGREGATED_EXTRACTION:
+            merged_film_works = self.__merger.serialize_aggregated(extracted_film_works)
         else:
-            extracted_film_works = target_film_works
-        if extracted_film_works:
             merged_film_works = self.__merger.merge_persons(extracted_film_works)
-            if merged_film_works:
-                transformed_film_works = self.__transformer.transform(merged_film_works)
-                if transformed_film_works:
-                    self.__loader.load_data(transformed_film_works)
+        return merged_film_works or None, on_loaded
+
+    def __transform_film_works(self, batch: tuple[Optional[dict], Optional[Callable]]
+                               ) -> tuple[Optional[list], Optional[Callable]]:
+        """
+        Transforms the batch of merged film works
+        """
+
+        merged_film_works, on_loaded = batch
+        if not merged_film_works:
+            return None, on_loaded
+        return self.__transformer.transform(merged_film_works) or None, on_loaded
+
+    def __upload_film_works(self,
+                            batch: tuple[Optional[list], Optional[Callable]],
+                            load_failed: threading.Event,
+                            index_name: Optional[str] = None
+                            ) -> None:
+        """
+        Loads the batch of transformed film works and calls its callback (saving the watermark) after that
+
+        Once some documents failed to load, the callbacks of this and all the following batches aren't called, so
+        the checkpoint never passes the failed documents and the next check is resumed from the last fully loaded batch.
+        """
+
+        transformed_film_works, on_loaded = batch
+        if self.__shard_coordinator:
+            self.__shard_coordinator.ensure_held()
+        if transformed_film_works:
+            _, failed = self.__loader.load_data(transformed_film_works, index_name) or (0, [])
+            if failed and not load_failed.is_set():
+                self.__logger.error(f"{len(failed)} film works failed to load, the checkpoint is kept before them")
+                load_failed.set()
+        if on_loaded and not load_failed.is_set():
+            on_loaded()
+
+    def __load_film_works(self,
+                          batches: Iterator[tuple[list[dict], Optional[Callable]]],
+                          index_name: Optional[str] = None
+                          ) -> bool:
+        """
+        Merges, transforms and loads the batches of extracted film work records (every batch is paired with the callback
+        called after it is loaded), returns False if some film works failed to load. The stages are overlapped
+        if pipelined execution is turned on: the next batch is extracted while the previous one is loaded
+        """
+
+        load_failed = threading.Event()
+        stages = [
+            ("merge", self.__merge_film_works),
+            ("transform", self.__transform_film_works),
+            ("load", partial(self.__upload_film_works, load_failed=load_failed, index_name=index_name)),
+        ]
+        if self.__executor:
+            self.__executor.run(batches, stages)
+        else:
+            for batch in batches:
+                for _, stage in stages:
+                    batch = stage(batch)
+        return not load_failed.is_set()
+
+    def __do_basic_pipeline(self,
+                            start_date: datetime.datetime,
+                            target_film_works: Optional[list] = None,
+                            index_name: Optional[str] = None
+                            ) -> bool:
+        """
+        Performs database check based on film work records, returns False if some film works failed to load
+        """
+
+        batches = ((extracted_film_works, None)
+                   for extracted_film_works in self.__extract_film_works(start_date, target_film_works))
+        return self.__load_film_works(batches, index_name)
 
     def __do_full_pipeline(self, start_date: datetime.datetime) -> None:
         """
         Performs full database check based on film work records and possible changes in related entities
         """
 
-        for entity in [e.value for e in Entities]:
-            entity_changes = self.__extractor.find_changes_in_related_entities(entity, start_date)
-            self.__do_basic_pipeline(start_date, entity_changes)
+        film_works_changed = self.__extractor.find_changes_in_related_entities(start_date)
+        if film_works_changed:
+            self.__do_basic_pipeline(start_date, film_works_changed)
 
         self.__do_basic_pipeline(start_date)
 
-    def do_etl_pipeline(self, start_date: datetime.datetime) -> None:
+    def __do_notified_pipeline(self, changes: dict[str, set]) -> None:
+        """
+        Performs pipeline for film works affected by notified changes
+        """
+
+        film_works_ids = self.__extractor.filter_shard_film_works(set(changes.get(FILM_WORK_ENTITY, ())))
+        related_entities_ids = {entity: list(changes[entity]) for entity in Entities if changes.get(entity)}
+        if related_entities_ids:
+            film_works_ids.update(self.__extractor.find_film_works_by_related_entities(related_entities_ids))
+
+        if film_works_ids:
+            self.__logger.debug(f"Loading {len(film_works_ids)} film works affected by notified changes")
+            self.__do_basic_pipeline(app_settings.EPOCH_START_DATE, list(film_works_ids))
+
+    def __get_state_key(self, key: str) -> str:
+        """
+        Returns the state key of the worker shard (the same key if not sharded)
+        """
+
+        if not self.__shard_coordinator:
+            return key
+        return f"shard_{self.__shard_coordinator.shard}_of_{self.__shard_coordinator.shards_count}:{key}"
+
+    def __get_watermarks(self) -> dict[str, tuple[str, str]]:
+        """
+        Returns (modified, id) watermarks of film works, genres and persons
+
+        On the first run film works are loaded from the very beginning, so genres and persons changed before the run
+        don't need to be checked. The last run time saved before watermarks were introduced is used if it exists.
+        """
+
+        entities = (FILM_WORK_ENTITY, *Entities)
+        watermarks = {entity: self.__state_handler.get_state(self.__get_state_key(f"{entity}_watermark"))
+                      for entity in entities}
+        if all(watermarks.values()):
+            return {entity: tuple(watermark) for entity, watermark in watermarks.items()}
+
+        last_updated = self.__state_handler.get_state("film_works_updated")
+        if last_updated:
+            initial_watermark = _make_watermark(datetime.datetime.fromisoformat(last_updated), KEYSET_START_KEY[1])
+        else:
+            initial_watermark = _make_watermark(datetime.datetime.now(datetime.timezone.utc), KEYSET_START_KEY[1])
+            if not watermarks[FILM_WORK_ENTITY]:
+                watermarks[FILM_WORK_ENTITY] = KEYSET_START_KEY
+        missing_watermarks = {self.__get_state_key(f"{entity}_watermark"): initial_watermark for entity in entities
+                              if not watermarks[entity]}
+        if missing_watermarks:
+            self.__state_handler.advance_states(missing_watermarks)
+        return {entity: tuple(watermarks[entity] or initial_watermark) for entity in entities}
+
+    def __advance_watermark(self, entity: str, watermark: list[str]) -> None:
+        """
+        Saves the watermark of the entity after its batch is processed (never moves it back)
+        """
+
+        self.__state_handler.advance_state(self.__get_state_key(f"{entity}_watermark"), watermark)
+
+    def __do_checkpointed_pipeline(self) -> None:
+        """
+        Performs complex database check starting from the watermarks, which are advanced after every loaded batch,
+        so the interrupted check is resumed from the last loaded batch
+        """
+
+        watermarks = self.__get_watermarks()
+
+        def get_checkpointed_batches() -> Iterator[tuple[list[dict], Callable]]:
+            for extracted_film_works in self.__extract_film_works(app_settings.EPOCH_START_DATE,
+                                                                  start_key=watermarks[FILM_WORK_ENTITY]):
+                last_record = extracted_film_works[-1]
+                watermark = _make_watermark(last_record["modified"], last_record["film_work_id"])
+                yield extracted_film_works, partial(self.__advance_watermark, FILM_WORK_ENTITY, watermark)
+
+        self.__load_film_works(get_checkpointed_batches())
+
+        for entity in Entities:
+            for changed_entities in self.__extractor.stream_changed_entities(entity, watermarks[entity]):
+                film_works_changed = self.__extractor.find_film_works_by_related_entities(
+                    {entity: [record["id"] for record in changed_entities]}, watermarks[FILM_WORK_ENTITY]
+                )
+                if film_works_changed \
+                        and not self.__do_basic_pipeline(app_settings.EPOCH_START_DATE, film_works_changed):
+                    # The watermark is kept before the entities whose film works failed to load
+                    break
+                last_record = changed_entities[-1]
+                self.__advance_watermark(entity, _make_watermark(last_record["modified"], last_record["id"]))
+
+    def do_etl_pipeline(self) -> None:
         """
         Performs complex database check
         """
@@ -105,7 +325,66 @@ class Pipeline:
             self.__elastic_client.execute(command="create_index", path_to_schema=app_settings.ELASTIC_SCHEMA)
             self.__state_handler.set_state("index_created", True)
 
-        if start_date == app_settings.EPOCH_START_DATE:
-            self.__do_basic_pipeline(start_date)
+        self.__do_checkpointed_pipeline()
+
+    @backoff(exceptions=(psycopg2.Error,))
+    def do_event_driven_pipeline(self) -> None:
+        """
+        Listens for changes notifications and performs pipeline for notified changes only
+
+        Complex database check is still performed on start and then every ETL_FALLBACK_POLL_INTERVAL seconds to catch
+        the changes made while not listening.
+        """
+
+        pending_changes: dict[str, set] = defaultdict(set)
+        pending_since: Optional[float] = None
+        last_polled_at: Optional[float] = None
+
+        # Listening is started before the first check, so no changes made during the check are missed
+        for changes in self.__extractor.listen_changes(NOTIFY_CHANNEL, app_settings.ETL_NOTIFY_DEBOUNCE):
+            now = time.monotonic()
+            if last_polled_at is None or now - last_polled_at >= app_settings.ETL_FALLBACK_POLL_INTERVAL:
+                self.do_etl_pipeline()
+                last_polled_at = now
+
+            for entity, entities_ids in changes.items():
+                pending_changes[entity].update(entities_ids)
+            if pending_changes and pending_since is None:
+                pending_since = now
+
+            # Changes are loaded once notifications stop coming within the debounce window or on max delay
+            if pending_changes and (not changes or now - pending_since >= app_settings.ETL_NOTIFY_MAX_DELAY):
+                self.__do_notified_pipeline(pending_changes)
+                pending_changes, pending_since = defaultdict(set), None
+
+    def do_full_reindex(self) -> None:
+        """
+        Loads all film works into the new index version and switches the index alias to it
+        """
+
+        if self.__shard_coordinator:
+            # All the shards are loaded into the same index, the worker of the last loaded shard publishes it
+            index_name, started_at = self.__shard_coordinator.get_reindex_target(
+                lambda: self.__loader.create_reindex_index(app_settings.ELASTIC_SCHEMA)
+            )
+            reindex_started_at = datetime.datetime.fromisoformat(started_at)
         else:
-            self.__do_full_pipeline(start_date)
+            reindex_started_at = datetime.datetime.utcnow()
+            index_name = self.__loader.create_reindex_index(app_settings.ELASTIC_SCHEMA)
+        if not index_name:
+            return
+
+        self.__logger.debug(f"Starting full reindex into {index_name}")
+        self.__do_basic_pipeline(app_settings.EPOCH_START_DATE, index_name=index_name)
+        if not self.__shard_coordinator or self.__shard_coordinator.complete_reindex_shard(index_name):
+            self.__loader.publish_index(index_name, app_settings.ELASTIC_SCHEMA)
+            self.__state_handler.set_state("index_created", True)
+            if self.__shard_coordinator:
+                self.__shard_coordinator.publish_reindex(index_name)
+        else:
+            self.__logger.debug(f"Waiting for the other shards to be loaded into {index_name}")
+            self.__shard_coordinator.wait_reindex_published(index_name)
+
+        # Changes made while reindexing could be loaded into the previous index only
+        self.__do_full_pipeline(reindex_started_at)
+        self.__logger.debug(f"Full reindex into {index_name} finished")
@@ -0,0 +1,98 @@
+import queue
+import logging
+import threading
+from typing import Any, Callable, Iterator
+
+# Marks the end of the batches stream in the stage queue
+END_OF_BATCHES = object()
+
+
+class StagedExecutor:
+    """
+    Class for performing pipeline stages concurrently: batches are produced by the source in its own thread and passed
+    through the stages threads connected by bounded queues, so the next batch is extracted and transformed while
+    the previous one is loaded (the full queue blocks the previous stage). Batches order is kept by every stage.
+    The first failed stage stops the others and its exception is raised by run()
+    """
+
+    def __init__(self, queue_size: int, logger: logging.Logger, poll_timeout: float = 0.1):
+        self.__queue_size: int = queue_size
+        self.__logger: logging.Logger = logger
+        self.__poll_timeout: float = poll_timeout
+
+    def run(self, source: Iterator[Any], stages: list[tuple[str, Callable[[Any], Any]]]) -> None:
+        """
+        Passes every batch of the source through the stages (the result of every stage is passed to the next one)
+        and waits for all of them to be finished
+        """
+
+        stop_event = threading.Event()
+        errors = []
+        queues = [queue.Queue(maxsize=self.__queue_size) for _ in stages]
+
+        def put_batch(stage_queue: queue.Queue, batch: Any) -> bool:
+            while not stop_event.is_set():
+                try:
+                    stage_queue.put(batch, timeout=self.__poll_timeout)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get_batch(stage_queue: queue.Queue) -> Any:
+            while not stop_event.is_set():
+                try:
+                    return stage_queue.get(timeout=self.__poll_timeout)
+                except queue.Empty:
+                    continue
+            return END_OF_BATCHES
+
+        def fail(stage_name: str, error: BaseException) -> None:
+            self.__logger.error(f"Pipeline stage {stage_name} has failed: {error!r}")
+            errors.append(error)
+            stop_event.set()
+
+        def produce() -> None:
+            try:
+                for batch in source:
+                    if not put_batch(queues[0], batch):
+                        break
+            except BaseException as error:
+                fail("extract", error)
+            finally:
+                # the source generator is closed in the thread it was iterated in (server-side cursor is closed too)
+                if hasattr(source, "close"):
+                    source.close()
+                put_batch(queues[0], END_OF_BATCHES)
+
+        def consume(stage_number: int, stage_name: str, stage: Callable[[Any], Any]) -> None:
+            next_queue = queues[stage_number + 1] if stage_number + 1 < len(queues) else None
+            try:
+                while (batch := get_batch(queues[stage_number])) is not END_OF_BATCHES:
+                    result = stage(batch)
+                    if next_queue and not put_batch(next_queue, result):
+                        break
+            except BaseException as error:
+                fail(stage_name, error)
+            finally:
+                if next_queue:
+                    put_batch(next_queue, END_OF_BATCHES)
+
+        threads = [threading.Thread(target=produce, name="etl-stage-extract", daemon=True)]
+        threads.extend(threading.Thread(target=consume, args=(stage_number, stage_name, stage),
+                                        name=f"etl-stage-{stage_name}", daemon=True)
+                       for stage_number, (stage_name, stage) in enumerate(stages))
+        for thread in threads:
+            thread.start()
+
+        try:
+            for thread in threads:
+                thread.join()
+        except BaseException:
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+            raise
+
+        if errors:
+            raise errors[0]
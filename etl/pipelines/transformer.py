@@ -1,8 +1,9 @@
 import logging
-from copy import deepcopy
+from collections import defaultdict
 
 from pydantic import ValidationError
 
+from common.constants import Roles
 from common.serializers import PostgresFilmWorkSerializer, ElasticFilmWorkSerializer
 
 
@@ -20,6 +21,11 @@ class FilmWorkMerger:
         Merges different film work records extracted from database into one
         """
 
+        # Hashed indexes of persons names and ids (by film work and role) and genres (by film work) already merged
+        merged_names: dict[tuple[str, str], set[str]] = defaultdict(set)
+        merged_ids: dict[tuple[str, str], set[str]] = defaultdict(set)
+        merged_genres: dict[str, set[str]] = defaultdict(set)
+
         for film_work_record in income_film_works:
             try:
                 validated_film_work = PostgresFilmWorkSerializer(**film_work_record)
@@ -28,37 +34,61 @@ class FilmWorkMerger:
                 self.__logger.error(f"An error in serializing extracted form Postgres "
                                     f"film work record with ID {film_work_record_id} ")
             else:
+                film_work_id = film_work_record["film_work_id"]
                 person_role = validated_film_work.role
                 person_name = validated_film_work.full_name
                 person_id = validated_film_work.person_id
                 genre = validated_film_work.genres
                 if all([person_role, person_name, person_id, genre]):
-                    if film_work_record["film_work_id"] not in self.__merged_film_works:
+                    if film_work_id not in self.__merged_film_works:
                         setattr(validated_film_work, f"{person_role}_names", [person_name])
                         setattr(validated_film_work, f"{person_role}", [{"id": person_id, "name": person_name}])
                         setattr(validated_film_work, "genres_list", [genre])
-                        self.__merged_film_works[film_work_record["film_work_id"]] = validated_film_work
+                        self.__merged_film_works[film_work_id] = validated_film_work
+                        merged_names[film_work_id, person_role].add(person_name)
+                        merged_ids[film_work_id, person_role].add(person_id)
+                        merged_genres[film_work_id].add(genre)
                     else:
-                        existing_film_work = self.__merged_film_works[film_work_record["film_work_id"]]
-                        genres_list = getattr(existing_film_work, "genres_list")
-                        persons_roles_list = getattr(existing_film_work, f"{person_role}_names")
-                        persons_roles_list_extended = getattr(existing_film_work, f"{person_role}")
-                        if person_name not in persons_roles_list:
-                            persons_roles_list.append(person_name)
-                        if genre not in genres_list:
-                            genres_list.append(genre)
-                        persons_ids = [item[key] for item in persons_roles_list_extended
-                                       for key, value in item.items() if key == "id"]
-                        if person_id not in persons_ids:
-                            persons_roles_list_extended.append({"id": person_id, "name": person_name})
+                        existing_film_work = self.__merged_film_works[film_work_id]
+                        if person_name not in merged_names[film_work_id, person_role]:
+                            merged_names[film_work_id, person_role].add(person_name)
+                            getattr(existing_film_work, f"{person_role}_names").append(person_name)
+                        if genre not in merged_genres[film_work_id]:
+                            merged_genres[film_work_id].add(genre)
+                            existing_film_work.genres_list.append(genre)
+                        if person_id not in merged_ids[film_work_id, person_role]:
+                            merged_ids[film_work_id, person_role].add(person_id)
+                            getattr(existing_film_work, f"{person_role}").append({"id": person_id,
+                                                                                  "name": person_name})
                 else:
-                    self.__merged_film_works[film_work_record["film_work_id"]] = validated_film_work
+                    self.__merged_film_works[film_work_id] = validated_film_work
+                    for role in Roles:
+                        merged_names.pop((film_work_id, role), None)
+                        merged_ids.pop((film_work_id, role), None)
+                    merged_genres.pop(film_work_id, None)
         self.__logger.debug(f"Successfully merged extracted film work records into "
                             f"{len(self.__merged_film_works)} film work objects")
-        result = deepcopy(self.__merged_film_works)
-        self.__merged_film_works.clear()
+        result, self.__merged_film_works = self.__merged_film_works, {}
         return result
 
+    def serialize_aggregated(self, income_film_works: list[dict]) -> dict[str, PostgresFilmWorkSerializer]:
+        """
+        Serializes film work records extracted from database with already aggregated genres and participants
+        """
+
+        serialized_film_works = {}
+        for film_work_record in income_film_works:
+            try:
+                serialized_film_works[film_work_record["film_work_id"]] = PostgresFilmWorkSerializer(
+                    **film_work_record
+                )
+            except ValidationError:
+                film_work_record_id = film_work_record.get("film_work_id")
+                self.__logger.error(f"An error in serializing extracted form Postgres "
+                                    f"film work record with ID {film_work_record_id} ")
+        self.__logger.debug(f"Successfully serialized {len(serialized_film_works)} aggregated film work objects")
+        return serialized_film_works
+
 
 class PostgresToElasticTransformer:
     """
@@ -12,6 +12,28 @@ class AppSettings(BaseSettings):
 
     DB_QUERY_CHUNK_SIZE: int = 500
 
+    # streaming extraction through server-side cursor (film works are processed by batches of DB_QUERY_CHUNK_SIZE)
+    DB_STREAMING_EXTRACTION: bool = True
+    DB_CURSOR_ITERSIZE: int = 2000
+
+    # aggregating persons and genres in Postgres (one extracted record per film work)
+    DB_AGGREGATED_EXTRACTION: bool = True
+
+    # polling interval (fallback polling interval when listening for changes notifications)
+    ETL_POLL_INTERVAL: int = 10
+    ETL_FALLBACK_POLL_INTERVAL: int = 600
+
+    # event-driven mode: changes notified by Postgres triggers are coalesced within the debounce window
+    # (but not longer than max delay) and only the affected film works are loaded
+    ETL_LISTEN_CHANGES: bool = True
+    ETL_NOTIFY_DEBOUNCE: float = 0.5
+    ETL_NOTIFY_MAX_DELAY: float = 5.0
+
+    # pipelined execution: extract, merge, transform and load stages are run in their own threads connected
+    # by bounded queues of ETL_STAGE_QUEUE_SIZE batches, so the next batch is extracted while the previous is loaded
+    ETL_PIPELINED_STAGES: bool = True
+    ETL_STAGE_QUEUE_SIZE: int = 2
+
     # extracting start date
     EPOCH_START_DATE: PastDate = datetime.datetime(1970, 6, 24, 0, 0, 0)
 
@@ -23,6 +45,10 @@ class AppSettings(BaseSettings):
     POSTGRES_HOST: str = "postgres"
     POSTGRES_PORT: int = 5432
     POSTGRES_SCHEMA: str = "content"
+    POSTGRES_POOL_MIN_SIZE: int = 2
+    POSTGRES_POOL_MAX_SIZE: int = 4
+    # seconds between the server-side checks of the pooled connection before it is reused
+    POSTGRES_HEALTH_CHECK_INTERVAL: int = 30
 
     # ELASTIC
 
@@ -32,11 +58,35 @@ class AppSettings(BaseSettings):
     ELASTIC_INDEX_NAME: str = "movies"
     ELASTIC_SCHEMA: str = "elastic_schema.json"
 
+    # bulk loading (parallel_bulk is used if more than one thread is set, streaming_bulk otherwise)
+    ELASTIC_BULK_THREADS: int = 4
+    ELASTIC_BULK_CHUNK_SIZE: int = 500
+    ELASTIC_BULK_MAX_CHUNK_BYTES: int = 100 * 1024 * 1024
+
+    # full reindex (index versions are published through the ELASTIC_INDEX_NAME alias)
+    ELASTIC_REINDEX_REQUEST_TIMEOUT: int = 3600
+    ELASTIC_DELETE_OLD_INDEXES: bool = True
+
+    # seconds between the long-lived connections health checks (connections are also checked after failures)
+    ELASTIC_HEALTH_CHECK_INTERVAL: int = 60
+
+    # SHARDING (film work ids space is split into ETL_SHARDS_COUNT ranges, every worker process holds the lease of one
+    # of them in Redis; the count must be the same for all the workers, ETL_WORKERS processes are started locally and
+    # stop if all the shards are not held by the workers of all the nodes within ETL_SHARD_LEASE_TTL seconds)
+    ETL_SHARDS_COUNT: int = 1
+    ETL_SHARD_LEASE_TTL: int = 60
+    ETL_WORKERS: int = 1
+
     # REDIS
 
     REDIS_HOST: str = "127.0.0.1"
     REDIS_PORT: int = 6379
     REDIS_BASIC_STORAGE_KEY: str = "etl"
+    # "hash" keeps every state key in a separate field of REDIS_STATE_HASH_KEY hash, "json" keeps the whole state as
+    # a single json under REDIS_BASIC_STORAGE_KEY
+    REDIS_STATE_STORAGE: str = "hash"
+    REDIS_STATE_HASH_KEY: str = "etl:state"
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
 
 
 app_settings = AppSettings()
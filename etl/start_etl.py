@@ -1,12 +1,14 @@
 import logging
 import time
-import datetime
+import argparse
 import subprocess
+import multiprocessing
 
 from settings import app_settings
 from pipelines.pipeline import Pipeline
 from clients.redis_client import RedisClient
-from common.state_handler import RedisStorage, State
+from common.sharding import ShardCoordinator, ShardsNotCovered, ReindexAborted
+from common.state_handler import RedisStorage, RedisHashStorage, State
 
 
 def get_and_configure_logger() -> logging.Logger:
@@ -25,14 +27,52 @@ def get_and_configure_logger() -> logging.Logger:
     return logging.getLogger(__name__)
 
 
-if __name__ == "__main__":
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parses command line arguments
+    """
+
+    parser = argparse.ArgumentParser(description="Postgres to Elasticsearch ETL")
+    parser.add_argument("--full-reindex", action="store_true",
+                        help="rebuild the index from scratch in a new index version and switch the alias to it")
+    parser.add_argument("--workers", type=int, default=app_settings.ETL_WORKERS,
+                        help="number of local worker processes (each one holds one of ETL_SHARDS_COUNT shards, "
+                             "workers don't start until every shard is held by the workers of some node)")
+    return parser.parse_args()
+
+
+def run_worker(arguments: argparse.Namespace) -> None:
+    """
+    Runs ETL worker process (holding the lease of one of the shards if sharding is turned on)
+    """
+
     app_logger = get_and_configure_logger()
 
-    redis_client = RedisClient(app_settings.REDIS_HOST, app_settings.REDIS_PORT, app_logger)
+    redis_client = RedisClient(app_settings.REDIS_HOST, app_settings.REDIS_PORT, app_logger,
+                               app_settings.REDIS_HEALTH_CHECK_INTERVAL)
 
-    storage = RedisStorage(redis_client)
+    if app_settings.REDIS_STATE_STORAGE == "hash":
+        storage = RedisHashStorage(redis_client, legacy_key=app_settings.REDIS_BASIC_STORAGE_KEY)
+    else:
+        storage = RedisStorage(redis_client)
     state_handler = State(storage)
 
+    shard_coordinator = None
+    if app_settings.ETL_SHARDS_COUNT > 1:
+        shard_coordinator = ShardCoordinator(redis_client, app_settings.ETL_SHARDS_COUNT,
+                                             app_settings.ETL_SHARD_LEASE_TTL, app_settings.REDIS_BASIC_STORAGE_KEY,
+                                             app_logger)
+        shard_coordinator.acquire()
+        try:
+            # Every shard must be held by some worker, otherwise its film works are never extracted
+            shard_coordinator.wait_all_shards_held(app_settings.ETL_SHARD_LEASE_TTL)
+        except ShardsNotCovered as exception:
+            app_logger.error(f"{exception}: ETL_SHARDS_COUNT workers are required in total (start more local "
+                             f"workers with --workers or ETL on other nodes)")
+            shard_coordinator.release()
+            redis_client.close()
+            raise SystemExit(1)
+
     POSTGRES_DSN: dict[str, str] = {
         "dbname": app_settings.POSTGRES_DBNAME,
         "user": app_settings.POSTGRES_USER,
@@ -50,20 +90,49 @@ if __name__ == "__main__":
         ELASTIC_DSN,
         app_settings.ELASTIC_INDEX_NAME,
         app_logger,
-        state_handler
+        state_handler,
+        shard_coordinator
     )
 
-    last_updated = state_handler.get_state("film_works_updated")
+    try:
+        if arguments.full_reindex:
+            try:
+                pipeline.do_full_reindex()
+            except ReindexAborted as exception:
+                app_logger.error(exception)
+                raise SystemExit(1)
+            raise SystemExit
+
+        if app_settings.ETL_LISTEN_CHANGES:
+            app_logger.debug("Starting event-driven ETL process")
+            pipeline.do_event_driven_pipeline()
+            raise SystemExit
+
+        while True:
+            app_logger.debug("Starting ETL process")
+            try:
+                pipeline.do_etl_pipeline()
+                time.sleep(app_settings.ETL_POLL_INTERVAL)
+            except (SystemExit, KeyboardInterrupt) as e:
+                app_logger.debug("ETL Process stopped")
+                break
+    finally:
+        if shard_coordinator:
+            shard_coordinator.release()
+        pipeline.close()
+        redis_client.close()
 
-    start_date = last_updated if last_updated else app_settings.EPOCH_START_DATE
 
-    while True:
-        app_logger.debug("Starting ETL process")
-        try:
-            pipeline_started_at = datetime.datetime.utcnow()
-            state_handler.set_state("film_works_updated", pipeline_started_at.isoformat())
-            pipeline.do_etl_pipeline(start_date=start_date)
-            time.sleep(10)
-            start_date = pipeline_started_at
-        except (SystemExit, KeyboardInterrupt) as e:
-            app_logger.debug("ETL Process stopped")
+if __name__ == "__main__":
+    arguments = parse_arguments()
+
+    if arguments.workers > 1:
+        workers = [multiprocessing.Process(target=run_worker, args=(arguments,)) for _ in range(arguments.workers)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if any(worker.exitcode for worker in workers):
+            raise SystemExit(1)
+    else:
+        run_worker(arguments)
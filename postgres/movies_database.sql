@@ -42,13 +42,222 @@ CREATE TABLE IF NOT EXISTS content.person_film_work (
 );
 
 CREATE UNIQUE INDEX genre_idx ON content.genre(name);
+CREATE INDEX IF NOT EXISTS genre_modified_idx ON content.genre(modified, id);
 
 CREATE INDEX IF NOT EXISTS film_work_title_idx ON content.film_work(title);
 CREATE INDEX IF NOT EXISTS film_work_creation_date_idx ON content.film_work(creation_date);
 CREATE INDEX IF NOT EXISTS film_work_rating_idx ON content.film_work(rating);
+CREATE INDEX IF NOT EXISTS film_work_modified_idx ON content.film_work(modified, id);
+CREATE INDEX IF NOT EXISTS film_work_created_idx ON content.film_work(created, id);
 
 CREATE INDEX IF NOT EXISTS person_idx ON content.person(full_name);
+CREATE INDEX IF NOT EXISTS person_modified_idx ON content.person(modified, id);
 
 CREATE UNIQUE INDEX IF NOT EXISTS genre_film_work_idx ON content.genre_film_work(genre_id, film_work_id);
 
-CREATE UNIQUE INDEX IF NOT EXISTS person_film_work_idx ON content.person_film_work(person_id, film_work_id, role);
\ No newline at end of file
+CREATE UNIQUE INDEX IF NOT EXISTS person_film_work_idx ON content.person_film_work(person_id, film_work_id, role);
+-- Notifies ETL about changed rows: film work ids for film works and its link tables, entity ids for genres and persons.
+-- Triggers are statement-level, so bulk statements send one notification per chunk of ids instead of one per row
+-- (payload is limited to 8000 bytes). The channel name is fixed and must match NOTIFY_CHANNEL of the ETL
+CREATE OR REPLACE FUNCTION content.notify_etl_changes() RETURNS trigger AS $$
+DECLARE
+    entity_name TEXT := TG_TABLE_NAME;
+    changed_ids uuid[];
+    chunk_start INTEGER;
+    chunk_size CONSTANT INTEGER := 150;
+BEGIN
+    IF TG_TABLE_NAME IN ('genre_film_work', 'person_film_work') THEN
+        entity_name := 'film_work';
+        IF TG_OP = 'UPDATE' THEN
+            SELECT array_agg(DISTINCT film_work_id) INTO changed_ids
+            FROM (SELECT film_work_id FROM changed_rows UNION SELECT film_work_id FROM old_rows) links;
+        ELSE
+            SELECT array_agg(DISTINCT film_work_id) INTO changed_ids FROM changed_rows;
+        END IF;
+    ELSE
+        SELECT array_agg(id) INTO changed_ids FROM changed_rows;
+    END IF;
+
+    FOR chunk_start IN 1..COALESCE(cardinality(changed_ids), 0) BY chunk_size LOOP
+        PERFORM pg_notify('etl_changes', json_build_object(
+            'entity', entity_name, 'ids', changed_ids[chunk_start:chunk_start + chunk_size - 1]
+        )::text);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER film_work_etl_notify_insert AFTER INSERT ON content.film_work
+    REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.notify_etl_changes();
+CREATE OR REPLACE TRIGGER film_work_etl_notify_update AFTER UPDATE ON content.film_work
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.notify_etl_changes();
+CREATE OR REPLACE TRIGGER film_work_etl_notify_delete AFTER DELETE ON content.film_work
+    REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.notify_etl_changes();
+CREATE OR REPLACE TRIGGER genre_etl_notify_insert AFTER INSERT ON content.genre
+    REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.notify_etl_changes();
+CREATE OR REPLACE TRIGGER genre_etl_notify_update AFTER UPDATE ON content.genre
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.notify_etl_changes();
+CREATE OR REPLACE TRIGGER genre_etl_notify_delete AFTER DELETE ON content.genre
+    REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.notify_etl_changes();
+CREATE OR REPLACE TRIGGER person_etl_notify_insert AFTER INSERT ON content.person
+    REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.notify_etl_changes();
+CREATE OR REPLACE TRIGGER person_etl_notify_update AFTER UPDATE ON content.person
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.notify_etl_changes();
+CREATE OR REPLACE TRIGGER person_etl_notify_delete AFTER DELETE ON content.person
+    REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.notify_etl_changes();
+CREATE OR REPLACE TRIGGER genre_film_work_etl_notify_insert AFTER INSERT ON content.genre_film_work
+    REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.notify_etl_changes();
+CREATE OR REPLACE TRIGGER genre_film_work_etl_notify_update AFTER UPDATE ON content.genre_film_work
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.notify_etl_changes();
+CREATE OR REPLACE TRIGGER genre_film_work_etl_notify_delete AFTER DELETE ON content.genre_film_work
+    REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.notify_etl_changes();
+CREATE OR REPLACE TRIGGER person_film_work_etl_notify_insert AFTER INSERT ON content.person_film_work
+    REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.notify_etl_changes();
+CREATE OR REPLACE TRIGGER person_film_work_etl_notify_update AFTER UPDATE ON content.person_film_work
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.notify_etl_changes();
+CREATE OR REPLACE TRIGGER person_film_work_etl_notify_delete AFTER DELETE ON content.person_film_work
+    REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.notify_etl_changes();
+
+-- Denormalized film works read model for the API: one row per film work with precomputed genres and persons arrays.
+-- Changes of content tables only enqueue affected film work ids (no locks on the read model rows for the writers),
+-- the queue is drained by content.refresh_film_work_read() in short batches
+CREATE TABLE IF NOT EXISTS content.film_work_read (
+    id uuid PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    creation_date DATE,
+    rating FLOAT,
+    type TEXT NOT NULL,
+    -- keyset pagination key of the API (film works without creation time get the epoch, so they are never skipped)
+    created timestamp with time zone NOT NULL,
+    genres TEXT[] NOT NULL DEFAULT '{}',
+    actors TEXT[] NOT NULL DEFAULT '{}',
+    directors TEXT[] NOT NULL DEFAULT '{}',
+    writers TEXT[] NOT NULL DEFAULT '{}'
+);
+
+CREATE INDEX IF NOT EXISTS film_work_read_created_idx ON content.film_work_read(created, id);
+
+CREATE TABLE IF NOT EXISTS content.film_work_read_queue (
+    film_work_id uuid NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS film_work_read_queue_film_work_idx ON content.film_work_read_queue(film_work_id);
+
+CREATE OR REPLACE FUNCTION content.enqueue_film_work_read() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'film_work' THEN
+        INSERT INTO content.film_work_read_queue (film_work_id) SELECT id FROM changed_rows;
+    ELSIF TG_TABLE_NAME IN ('genre_film_work', 'person_film_work') THEN
+        INSERT INTO content.film_work_read_queue (film_work_id) SELECT film_work_id FROM changed_rows;
+        IF TG_OP = 'UPDATE' THEN
+            INSERT INTO content.film_work_read_queue (film_work_id) SELECT film_work_id FROM old_rows;
+        END IF;
+    ELSIF TG_TABLE_NAME = 'genre' THEN
+        INSERT INTO content.film_work_read_queue (film_work_id)
+        SELECT gfw.film_work_id FROM content.genre_film_work gfw JOIN changed_rows c ON c.id = gfw.genre_id;
+    ELSE
+        INSERT INTO content.film_work_read_queue (film_work_id)
+        SELECT pfw.film_work_id FROM content.person_film_work pfw JOIN changed_rows c ON c.id = pfw.person_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Refreshes read model rows of the next batch of queued film works (only of the target ones if provided), returns
+-- the number of refreshed film works
+DROP FUNCTION IF EXISTS content.refresh_film_work_read(INTEGER);
+CREATE OR REPLACE FUNCTION content.refresh_film_work_read(batch_size INTEGER DEFAULT 1000,
+                                                          target_ids uuid[] DEFAULT NULL) RETURNS INTEGER AS $$
+DECLARE
+    film_work_ids uuid[];
+BEGIN
+    WITH queued AS (
+        DELETE FROM content.film_work_read_queue
+        WHERE ctid IN (SELECT ctid FROM content.film_work_read_queue
+                       WHERE target_ids IS NULL OR film_work_id = ANY(target_ids)
+                       LIMIT batch_size FOR UPDATE SKIP LOCKED)
+        RETURNING film_work_id
+    )
+    SELECT array_agg(DISTINCT film_work_id) INTO film_work_ids FROM queued;
+    IF film_work_ids IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    DELETE FROM content.film_work_read fwr
+    WHERE fwr.id = ANY(film_work_ids) AND NOT EXISTS (SELECT 1 FROM content.film_work fw WHERE fw.id = fwr.id);
+
+    INSERT INTO content.film_work_read
+        (id, title, description, creation_date, rating, type, created, genres, actors, directors, writers)
+    SELECT fw.id, fw.title, fw.description, fw.creation_date, fw.rating, fw.type, COALESCE(fw.created, 'epoch'),
+           COALESCE(fw_genres.genres, '{}'), COALESCE(fw_persons.actors, '{}'),
+           COALESCE(fw_persons.directors, '{}'), COALESCE(fw_persons.writers, '{}')
+    FROM content.film_work fw
+    LEFT JOIN LATERAL (
+        SELECT array_agg(DISTINCT g.name) AS genres
+        FROM content.genre_film_work gfw
+        JOIN content.genre g ON g.id = gfw.genre_id
+        WHERE gfw.film_work_id = fw.id
+    ) fw_genres ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT array_agg(DISTINCT p.full_name) FILTER (WHERE pfw.role = 'actor') AS actors,
+               array_agg(DISTINCT p.full_name) FILTER (WHERE pfw.role = 'director') AS directors,
+               array_agg(DISTINCT p.full_name) FILTER (WHERE pfw.role = 'writer') AS writers
+        FROM content.person_film_work pfw
+        JOIN content.person p ON p.id = pfw.person_id
+        WHERE pfw.film_work_id = fw.id
+    ) fw_persons ON TRUE
+    WHERE fw.id = ANY(film_work_ids)
+    ORDER BY fw.id
+    ON CONFLICT (id) DO UPDATE SET
+        title = EXCLUDED.title,
+        description = EXCLUDED.description,
+        creation_date = EXCLUDED.creation_date,
+        rating = EXCLUDED.rating,
+        type = EXCLUDED.type,
+        created = EXCLUDED.created,
+        genres = EXCLUDED.genres,
+        actors = EXCLUDED.actors,
+        directors = EXCLUDED.directors,
+        writers = EXCLUDED.writers;
+
+    RETURN cardinality(film_work_ids);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER film_work_read_insert AFTER INSERT ON content.film_work
+    REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.enqueue_film_work_read();
+CREATE OR REPLACE TRIGGER film_work_read_update AFTER UPDATE ON content.film_work
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.enqueue_film_work_read();
+CREATE OR REPLACE TRIGGER film_work_read_delete AFTER DELETE ON content.film_work
+    REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.enqueue_film_work_read();
+CREATE OR REPLACE TRIGGER genre_read_update AFTER UPDATE ON content.genre
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.enqueue_film_work_read();
+CREATE OR REPLACE TRIGGER genre_read_delete AFTER DELETE ON content.genre
+    REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.enqueue_film_work_read();
+CREATE OR REPLACE TRIGGER person_read_update AFTER UPDATE ON content.person
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.enqueue_film_work_read();
+CREATE OR REPLACE TRIGGER person_read_delete AFTER DELETE ON content.person
+    REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.enqueue_film_work_read();
+CREATE OR REPLACE TRIGGER genre_film_work_read_insert AFTER INSERT ON content.genre_film_work
+    REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.enqueue_film_work_read();
+CREATE OR REPLACE TRIGGER genre_film_work_read_update AFTER UPDATE ON content.genre_film_work
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.enqueue_film_work_read();
+CREATE OR REPLACE TRIGGER genre_film_work_read_delete AFTER DELETE ON content.genre_film_work
+    REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.enqueue_film_work_read();
+CREATE OR REPLACE TRIGGER person_film_work_read_insert AFTER INSERT ON content.person_film_work
+    REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.enqueue_film_work_read();
+CREATE OR REPLACE TRIGGER person_film_work_read_update AFTER UPDATE ON content.person_film_work
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.enqueue_film_work_read();
+CREATE OR REPLACE TRIGGER person_film_work_read_delete AFTER DELETE ON content.person_film_work
+    REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION content.enqueue_film_work_read();